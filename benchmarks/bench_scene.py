@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+
+"""Benchmarks for `xynodeeditor` scenes with many nodes.
+
+Generates graphs of the given sizes and times the common scene
+operations. Results are written as JSON so they can be compared between
+releases::
+
+    python benchmarks/bench_scene.py --sizes 100 1000 10000 --fan-out 2 --output results.json
+
+With ``--headless`` only the operations which do not need graphics are
+measured and PySide2 is not imported at all.
+"""
+
+import argparse
+import contextlib
+import gc
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from xynodeeditor.node_scene import Scene
+from xynodeeditor.node_node import Node
+from xynodeeditor.node_edge import EDGE_TYPE_BEZIER, Edge
+
+
+NODE_SPACING_X = 250
+NODE_SPACING_Y = 300
+
+
+def generateGraph(scene, nodes_count, fan_out=2, seed=0):
+    ''' adds nodes_count nodes on a grid, each input is connected to an earlier node '''
+    rnd = random.Random(seed)
+    columns = max(1, int(nodes_count ** 0.5))
+
+    nodes = []
+    for i in range(nodes_count):
+        node = Node(scene, "Node %d" % i, inputs=[1] * fan_out, outputs=[1])
+        node.setPos((i % columns) * NODE_SPACING_X, (i // columns) * NODE_SPACING_Y)
+        nodes.append(node)
+
+    for i, node in enumerate(nodes[1:], 1):
+        for socket in node.inputs:
+            Edge(scene, nodes[rnd.randrange(i)].outputs[0], socket, EDGE_TYPE_BEZIER)
+
+    return nodes
+
+
+def generateGraphBulk(scene, nodes_count, fan_out=2, seed=0):
+    ''' the same graph as generateGraph(), built with the bulk scene methods '''
+    rnd = random.Random(seed)
+    columns = max(1, int(nodes_count ** 0.5))
+
+    nodes = scene.addNodesFrom({
+        'title': "Node %d" % i,
+        'inputs': [1] * fan_out,
+        'outputs': [1],
+        'pos': ((i % columns) * NODE_SPACING_X, (i // columns) * NODE_SPACING_Y),
+    } for i in range(nodes_count))
+
+    scene.addEdgesFrom((nodes[rnd.randrange(i)].outputs[0], socket)
+                       for i, node in enumerate(nodes[1:], 1) for socket in node.inputs)
+    return nodes
+
+
+def selectEvery(nodes, step):
+    for node in nodes[::step]:
+        node.grNode.setSelected(True)
+
+
+class BenchmarkRunner():
+    def __init__(self, headless=False):
+        self.headless = headless
+        self.results = []
+        self.app = None
+        if not headless:
+            os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+            from PySide2.QtWidgets import QApplication
+            self.app = QApplication.instance() or QApplication([])
+
+    def measure(self, name, nodes_count, fan_out, func):
+        # garbage left by the previous benchmark is not collected on its time
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        seconds = time.perf_counter() - start
+        self.results.append({
+            'benchmark': name,
+            'nodes': nodes_count,
+            'fan_out': fan_out,
+            'seconds': seconds,
+        })
+        print("%-24s %8d nodes  %10.4f s" % (name, nodes_count, seconds), file=sys.stderr)
+
+    def createView(self, scene):
+        from PySide2.QtCore import QPointF
+        from xynodeeditor.node_graphics_view import QDMGraphicsView
+
+        view = QDMGraphicsView(scene.grScene)
+        view.last_scene_mouse_position = QPointF(0, 0)
+        return view
+
+    def run(self, nodes_count, fan_out):
+        scene = Scene(headless=self.headless)
+        nodes = []
+        self.measure('construction', nodes_count, fan_out,
+                     lambda: nodes.extend(generateGraph(scene, nodes_count, fan_out)))
+        bulk_scene = Scene(headless=self.headless)
+        self.measure('bulk construction', nodes_count, fan_out,
+                     lambda: generateGraphBulk(bulk_scene, nodes_count, fan_out))
+        bulk_scene.clear()
+        self.measure('serialize', nodes_count, fan_out, scene.serialize)
+
+        handle, filename = tempfile.mkstemp(suffix='.json')
+        os.close(handle)
+        try:
+            self.measure('saveToFile', nodes_count, fan_out, lambda: scene.saveToFile(filename))
+            loaded_scene = Scene(headless=self.headless)
+            self.measure('loadFromFile', nodes_count, fan_out, lambda: loaded_scene.loadFromFile(filename))
+            self.measure('clear', nodes_count, fan_out, loaded_scene.clear)
+        finally:
+            os.remove(filename)
+
+        scene.history.storeHistory("Init add nodes")
+        nodes[0].setPos(-NODE_SPACING_X, -NODE_SPACING_Y)
+        self.measure('storeHistory', nodes_count, fan_out,
+                     lambda: scene.history.storeHistory("Node moved!", setModified=True))
+        self.measure('undo', nodes_count, fan_out, scene.history.undo)
+        self.measure('redo', nodes_count, fan_out, scene.history.redo)
+
+        if self.headless:
+            return
+
+        view = self.createView(scene)
+        selectEvery(scene.nodes, 10)
+        data = {}
+        self.measure('clipboard copy', nodes_count, fan_out,
+                     lambda: data.update(scene.clipboard.serializeSelected(delete=False)))
+        self.measure('clipboard paste', nodes_count, fan_out,
+                     lambda: scene.clipboard.deserializeFromClipboard(data))
+
+        scene.grScene.clearSelection()
+        selectEvery(scene.nodes, 10)
+        self.measure('deleteSelected', nodes_count, fan_out, view.deleteSelected)
+
+        # a vertical cut through the middle of the graph
+        from PySide2.QtCore import QPointF
+        columns = max(1, int(nodes_count ** 0.5))
+        cut_x = (columns // 2) * NODE_SPACING_X - NODE_SPACING_X / 2
+        rows = nodes_count // columns + 1
+        view.cutline.line_points = [QPointF(cut_x, -NODE_SPACING_Y),
+                                    QPointF(cut_x, rows * NODE_SPACING_Y)]
+        self.measure('cutIntersectingEdges', nodes_count, fan_out, view.cutIntersectingEdges)
+        view.cutline.line_points = []
+
+        scene.clear()
+        view.deleteLater()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000],
+                        help='numbers of nodes to generate')
+    parser.add_argument('--fan-out', type=int, default=2, help='inputs per node')
+    parser.add_argument('--headless', action='store_true', help='skip benchmarks needing graphics')
+    parser.add_argument('--output', help='write results to this JSON file instead of stdout')
+    args = parser.parse_args(argv)
+
+    # keep stdout for the report, scene methods print progress messages
+    runner = BenchmarkRunner(headless=args.headless)
+    with contextlib.redirect_stdout(sys.stderr):
+        for nodes_count in args.sizes:
+            runner.run(nodes_count, args.fan_out)
+
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'headless': args.headless,
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'results': runner.results,
+    }
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=4)
+    else:
+        print(json.dumps(report, indent=4))
+
+
+if __name__ == '__main__':
+    main()
@@ -52,6 +52,10 @@ class CalculatorWindow(NodeEditorWindow):
         self.setWindowTitle("Calculator NodeEditor Example")
 
     def closeEvent(self, event):
+        # keep the windows of files which could not be saved open
+        if not self.waitForSaves():
+            event.ignore()
+            return
         self.mdiArea.closeAllSubWindows()
         if self.mdiArea.currentSubWindow():
             event.ignore()
@@ -0,0 +1,254 @@
+#!/usr/bin/env python
+
+"""Tests for `Scene` object registries."""
+
+import gc
+import os
+import random
+import subprocess
+import sys
+import unittest
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PySide2.QtCore import QPointF
+from PySide2.QtWidgets import QApplication, QGraphicsScene
+
+from xynodeeditor.node_scene import Scene
+from xynodeeditor.node_node import Node
+from xynodeeditor.node_edge import EDGE_TYPE_BEZIER, Edge
+
+
+app = QApplication.instance() or QApplication([])
+
+
+class TestScene(unittest.TestCase):
+    """Tests for `Scene` lookups by id."""
+
+    def setUp(self):
+        """Set up a small graph of two connected nodes."""
+        self.scene = Scene()
+        self.node1 = Node(self.scene, "Node 1", inputs=[0], outputs=[1])
+        self.node2 = Node(self.scene, "Node 2", inputs=[1], outputs=[2])
+        self.edge = Edge(self.scene, self.node1.outputs[0], self.node2.inputs[0], EDGE_TYPE_BEZIER)
+
+    def test_000_lookup(self):
+        """Test if nodes, edges and sockets can be found by id."""
+        self.assertIs(self.scene.getNodeById(self.node1.id), self.node1)
+        self.assertIs(self.scene.getEdgeById(self.edge.id), self.edge)
+        socket = self.node2.inputs[0]
+        self.assertIs(self.scene.getSocketById(socket.id), socket)
+        self.assertEqual(len(self.scene.sockets), 4)
+
+    def test_001_remove(self):
+        """Test if removing a node unregisters it and its sockets."""
+        self.node1.remove()
+        self.assertIsNone(self.scene.getNodeById(self.node1.id))
+        self.assertIsNone(self.scene.getSocketById(self.node1.outputs[0].id))
+        self.assertEqual(self.scene.nodes, [self.node2])
+
+    def test_002_deserialize_restores_ids(self):
+        """Test if registries follow ids restored by deserialize."""
+        data = self.scene.serialize()
+        self.scene.deserialize(data)
+        self.assertEqual([node.id for node in self.scene.nodes],
+                         [node_data['id'] for node_data in data['nodes']])
+        self.assertIsNotNone(self.scene.getEdgeById(data['edges'][0]['id']))
+        self.assertIsNotNone(self.scene.getSocketById(data['edges'][0]['start']))
+
+    def test_003_headless(self):
+        """Test if a headless scene can be built and loaded without PySide2."""
+        code = "\n".join([
+            "import sys",
+            "from xynodeeditor.node_scene import Scene",
+            "from xynodeeditor.node_node import Node",
+            "from xynodeeditor.node_edge import Edge",
+            "scene = Scene(headless=True)",
+            "node1 = Node(scene, 'Node 1', inputs=[0], outputs=[1])",
+            "node2 = Node(scene, 'Node 2', inputs=[1], outputs=[2])",
+            "node2.setPos(100, 50)",
+            "Edge(scene, node1.outputs[0], node2.inputs[0])",
+            "scene.history.storeHistory('Init add nodes')",
+            "node1.remove()",
+            "scene.history.storeHistory('Delete selected')",
+            "scene.history.undo()",
+            "data = scene.serialize()",
+            "scene.deserialize(data)",
+            "assert scene.serialize() == data",
+            "assert len(scene.edges) == 1",
+            "assert 'PySide2' not in sys.modules",
+        ])
+        subprocess.run([sys.executable, '-c', code], check=True)
+
+    def test_004_attach_graphics(self):
+        """Test if graphics can be attached to a headless scene later."""
+        scene = Scene(headless=True)
+        scene.deserialize(self.scene.serialize())
+        scene.nodes[0].setPos(30, 40)
+        self.assertEqual(scene.nodes[0].pos, QPointF(30, 40))
+        scene.initUI()
+        self.assertEqual(scene.nodes[0].pos, QPointF(30, 40))
+        scene.nodes[0].setPos(0, 0)
+        for node in scene.nodes:
+            self.assertIs(node.grNode.scene(), scene.grScene)
+        self.assertIs(scene.edges[0].grEdge.scene(), scene.grScene)
+        self.assertEqual(scene.serialize(), self.scene.serialize())
+
+    def test_005_edge_path_cache(self):
+        """Test if the edge path is only rebuilt after an end point moved."""
+        grEdge = self.edge.grEdge
+        path = grEdge.getPath()
+        self.assertIs(grEdge.getPath(), path)
+        self.node2.setPos(100, 50)
+        self.node2.updateConnectedEdges()
+        self.assertIsNot(grEdge.getPath(), path)
+        self.assertTrue(grEdge.boundingRect().contains(grEdge.getPath().boundingRect()))
+
+    def test_006_lazy_content(self):
+        """Test if content widgets are created only when the node is edited."""
+        self.assertIsNone(self.node1.content)
+        self.assertIsNone(self.node1.grNode.grContent)
+        self.node1.initContent()
+        self.assertIs(self.node1.grNode.grContent.widget(), self.node1.content)
+
+    def test_007_dirty_edges(self):
+        """Test if edges of selected nodes are updated on the next event loop iteration."""
+        self.node2.grNode.setSelected(True)
+        self.assertEqual(self.scene.grScene.getSelectedNodes(), [self.node2])
+
+        self.node2.grNode.setPos(100, 50)
+        self.scene.grScene.scheduleEdgesUpdate(self.node2)
+        destination = list(self.edge.grEdge.posDestination)
+        app.processEvents()
+        self.assertEqual(self.edge.grEdge.posDestination, [destination[0] + 100, destination[1] + 50])
+
+    def test_008_bulk_add(self):
+        """Test if nodes and edges added in bulk get their graphics when the batch ends."""
+        nodes = self.scene.addNodesFrom([
+            {'title': "Bulk %d" % i, 'inputs': [1], 'outputs': [1], 'pos': (i * 200, 0)} for i in range(3)])
+        edges = self.scene.addEdgesFrom([(nodes[0].outputs[0], nodes[1].inputs[0]),
+                                         (nodes[1].outputs[0], nodes[2].inputs[0])])
+
+        self.assertEqual(self.scene.grScene.itemIndexMethod(), QGraphicsScene.BspTreeIndex)
+        self.assertEqual(nodes[2].grNode.pos(), QPointF(400, 0))
+        self.assertIn(edges[0].grEdge, self.scene.grScene.items())
+        self.assertEqual(len(self.scene.nodes), 5)
+
+        with self.scene.deferUI():
+            node = Node(self.scene, "Deferred", inputs=[1], outputs=[])
+            self.assertIsNone(node.grNode)
+        self.assertIsNotNone(node.inputs[0].grSocket)
+
+    def test_009_remove_items(self):
+        """Test if removing many items at once detaches them and their edges."""
+        hub = Node(self.scene, "Hub", inputs=[], outputs=[1])
+        nodes = self.scene.addNodesFrom({'inputs': [1]} for i in range(20))
+        edges = self.scene.addEdgesFrom((hub.outputs[0], node.inputs[0]) for node in nodes)
+
+        self.scene.removeItems(nodes[:10], [edges[15], edges[15]])
+        self.assertEqual(len(hub.outputs[0].edges), 9)
+        self.assertFalse(edges[0].isAttached())
+        self.assertIsNone(edges[0].grEdge)
+        self.assertFalse(nodes[0].isAttached())
+        self.assertTrue(nodes[15].isAttached())
+
+        hub.outputs[0].removeAllEdges()
+        self.assertEqual(self.scene.edges, [self.edge])
+        self.assertEqual(self.scene.grScene.itemIndexMethod(), QGraphicsScene.BspTreeIndex)
+
+    def test_010_clear(self):
+        """Test if clear drops all nodes and edges but keeps other graphics items."""
+        rect = self.scene.grScene.addRect(0, 0, 10, 10)
+        self.node1.grNode.setSelected(True)
+        self.scene.clear()
+
+        self.assertEqual(self.scene.nodes, [])
+        self.assertEqual(self.scene.edges, [])
+        self.assertEqual(self.scene.sockets, [])
+        self.assertIsNone(self.node1.grNode)
+        self.assertEqual(self.scene.grScene.items(), [rect])
+        self.assertEqual(self.scene.grScene.getSelectedNodes(), [])
+
+    def test_011_serialize_cache(self):
+        """Test if serialized records are reused until the object changes."""
+        data = self.node1.serialize()
+        edge_data = self.edge.serialize()
+        self.assertIs(self.node1.serialize(), data)
+        self.assertIs(self.edge.serialize(), edge_data)
+
+        # moved by Qt directly, the old record stays as it was
+        self.node1.grNode.setPos(30, 40)
+        moved_data = self.node1.serialize()
+        self.assertEqual((moved_data['pos_x'], moved_data['pos_y']), (30, 40))
+        self.assertEqual((data['pos_x'], data['pos_y']), (0, 0))
+
+        self.scene.reindexSocket(self.node1.outputs[0], 1234)
+        self.assertEqual(self.node1.serialize()['outputs'][0]['id'], 1234)
+        self.assertEqual(self.edge.serialize()['start'], 1234)
+
+        self.node1.title = "Renamed"
+        self.assertEqual(self.node1.serialize()['title'], "Renamed")
+        self.assertEqual(moved_data['title'], "Node 1")
+
+    def test_012_graph(self):
+        """Test if the adjacency index and topological order follow edges being connected and removed."""
+        graph = self.scene.graph
+        node3 = Node(self.scene, "Node 3", inputs=[1], outputs=[1])
+        self.assertEqual(graph.getChildrenNodes(self.node1), [self.node2])
+        self.assertEqual(graph.getParentNodes(self.node2), [self.node1])
+
+        # connected against the creation order
+        edge = Edge(self.scene, node3.outputs[0], self.node1.inputs[0], EDGE_TYPE_BEZIER)
+        self.assertEqual(graph.getTopologicalOrder(), [node3, self.node1, self.node2])
+        self.assertEqual(graph.getDescendants(node3), [self.node1, self.node2])
+        self.assertTrue(graph.wouldCreateCycle(self.node2.outputs[0], node3.inputs[0]))
+        self.assertTrue(graph.wouldCreateCycle(node3.inputs[0], self.node2.outputs[0]))
+        self.assertFalse(graph.wouldCreateCycle(node3.outputs[0], self.node2.inputs[0]))
+
+        edge.remove()
+        self.assertEqual(graph.getParentNodes(self.node1), [])
+        self.assertFalse(graph.wouldCreateCycle(self.node2.outputs[0], node3.inputs[0]))
+        self.node2.remove()
+        self.assertEqual(graph.getChildrenNodes(self.node1), [])
+        self.assertEqual(set(graph.getTopologicalOrder()), {self.node1, node3})
+
+    def test_013_graph_random(self):
+        """Test if the incremental order matches walking all edges on random rewiring."""
+        rnd = random.Random(0)
+        graph = self.scene.graph
+        nodes = [Node(self.scene, "Node", inputs=[1], outputs=[1]) for i in range(30)]
+        for i in range(200):
+            start, end = rnd.sample(nodes, 2)
+            if graph.wouldCreateCycle(start.outputs[0], end.inputs[0]):
+                # there is a path back from end to start
+                self.assertIn(start, graph.getDescendants(end))
+            else:
+                self.assertNotIn(start, graph.getDescendants(end))
+                Edge(self.scene, start.outputs[0], end.inputs[0], EDGE_TYPE_BEZIER)
+            if i % 5 == 0:
+                rnd.choice(self.scene.edges).remove()
+
+        ranks = {node: rank for rank, node in enumerate(graph.getTopologicalOrder())}
+        self.assertEqual(len(ranks), len(self.scene.nodes))
+        for edge in self.scene.edges:
+            self.assertLess(ranks[edge.start_socket.node], ranks[edge.end_socket.node])
+
+        # loaded edges are ordered at once
+        scene = Scene(headless=True)
+        scene.deserialize(self.scene.serialize())
+        ranks = {node: rank for rank, node in enumerate(scene.graph.getTopologicalOrder())}
+        for edge in scene.edges:
+            self.assertLess(ranks[edge.start_socket.node], ranks[edge.end_socket.node])
+
+    def test_014_ids_not_reused(self):
+        """Test if nodes created after reloading and freeing others do not take over their ids."""
+        for i in range(20):
+            Node(self.scene, "Node", inputs=[1], outputs=[1])
+        for trial in range(3):
+            self.scene.deserialize(self.scene.serialize())
+            gc.collect()
+            count = len(self.scene.nodes)
+            for i in range(20):
+                Node(self.scene, "Node", inputs=[1], outputs=[1])
+            self.assertEqual(len(self.scene.nodes), count + 20)
+            self.assertEqual(len(self.scene.serialize()['nodes']), count + 20)
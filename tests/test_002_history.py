@@ -0,0 +1,324 @@
+#!/usr/bin/env python
+
+"""Tests for `SceneHistory`."""
+
+import gc
+import os
+import tempfile
+import unittest
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PySide2.QtWidgets import QApplication
+
+from xynodeeditor.node_scene import Scene
+from xynodeeditor.node_node import Node
+from xynodeeditor.node_edge import EDGE_TYPE_BEZIER, Edge
+from xynodeeditor.node_scene_history import HISTORY_MODE_SNAPSHOT, SceneHistory
+from xynodeeditor.node_scene_journal import SceneJournal
+
+
+app = QApplication.instance() or QApplication([])
+
+
+class TestSceneHistory(unittest.TestCase):
+    """Tests for undo and redo of delta stamps."""
+
+    def setUp(self):
+        """Set up a chain of three connected nodes."""
+        self.scene = Scene()
+        self.nodes = [Node(self.scene, "Node %d" % i, inputs=[0], outputs=[1]) for i in range(3)]
+        for node1, node2 in zip(self.nodes, self.nodes[1:]):
+            Edge(self.scene, node1.outputs[0], node2.inputs[0], EDGE_TYPE_BEZIER)
+        self.scene.history.storeHistory("Init add nodes")
+
+    def test_000_delete_node(self):
+        """Test if undo brings back a removed node with its edges."""
+        data = self.scene.serialize()
+        self.nodes[1].remove()
+        self.scene.history.storeHistory("Delete selected", setModified=True)
+        self.assertEqual(len(self.scene.nodes), 2)
+        self.assertEqual(len(self.scene.edges), 0)
+
+        self.scene.history.undo()
+        self.assertEqual(len(self.scene.nodes), 3)
+        self.assertEqual(len(self.scene.edges), 2)
+        self.assertEqual(sorted(edge['id'] for edge in self.scene.serialize()['edges']),
+                         sorted(edge['id'] for edge in data['edges']))
+
+        self.scene.history.redo()
+        self.assertIsNone(self.scene.getNodeById(self.nodes[1].id))
+        self.assertEqual(len(self.scene.edges), 0)
+
+    def test_001_move_node(self):
+        """Test if undo and redo only move the node back and forth."""
+        node = self.nodes[0]
+        node.setPos(100, 50)
+        self.scene.history.storeHistory("Node moved!", setModified=True)
+        stamp = self.scene.history.history_stack[-1]
+        self.assertEqual(stamp['changes']['nodes_moved'], [[node.id, 0, 0, 100, 50]])
+
+        self.scene.history.undo()
+        self.assertIs(self.scene.getNodeById(node.id), node)
+        self.assertEqual(node.getPos(), (0, 0))
+        self.scene.history.redo()
+        self.assertEqual(node.getPos(), (100, 50))
+
+    def test_002_add_edge(self):
+        """Test if a new edge is undone and redone."""
+        edge = Edge(self.scene, self.nodes[2].outputs[0], self.nodes[0].inputs[0], EDGE_TYPE_BEZIER)
+        self.scene.history.storeHistory("Created new edge by dargging", setModified=True)
+        self.scene.history.undo()
+        self.assertIsNone(self.scene.getEdgeById(edge.id))
+        self.assertEqual(len(self.nodes[0].inputs[0].edges), 0)
+        self.scene.history.redo()
+        self.assertEqual(self.nodes[0].inputs[0].edges[0].id, edge.id)
+
+    def test_003_snapshot_patch(self):
+        """Test if snapshot restore keeps nodes which did not change."""
+        self.scene.history.mode = HISTORY_MODE_SNAPSHOT
+        self.scene.history.storeHistory("Init add nodes")
+        self.nodes[0].setPos(100, 50)
+        self.nodes[2].remove()
+        self.scene.history.storeHistory("Delete selected", setModified=True)
+
+        self.scene.history.undo()
+        self.assertIs(self.scene.getNodeById(self.nodes[0].id), self.nodes[0])
+        self.assertIs(self.scene.getNodeById(self.nodes[1].id), self.nodes[1])
+        self.assertEqual(self.nodes[0].getPos(), (0, 0))
+        self.assertIsNotNone(self.scene.getNodeById(self.nodes[2].id))
+        self.assertEqual(len(self.scene.edges), 2)
+
+        self.scene.history.redo()
+        self.assertEqual(len(self.scene.nodes), 2)
+        self.assertEqual(len(self.scene.edges), 1)
+
+    def test_004_selection_stamps(self):
+        """Test if selection stamps only restore selection and replace each other."""
+        history = self.scene.history
+        self.nodes[0].grNode.setSelected(True)
+        history.storeSelectionHistory("Selection changed")
+        self.nodes[1].grNode.setSelected(True)
+        history.storeSelectionHistory("Selection changed")
+        self.assertEqual(len(history.history_stack), 2)
+        self.assertNotIn('changes', history.history_stack[-1])
+
+        history.undo()
+        self.assertEqual(len(self.scene.grScene.selectedItems()), 0)
+        history.redo()
+        self.assertEqual(sorted(item.node.id for item in self.scene.grScene.selectedItems()),
+                         sorted([self.nodes[0].id, self.nodes[1].id]))
+        self.assertIs(self.scene.getNodeById(self.nodes[0].id), self.nodes[0])
+
+    def test_005_selection_stamps_snapshot(self):
+        """Test if snapshot mode restores the snapshot below a selection stamp."""
+        history = self.scene.history
+        history.mode = HISTORY_MODE_SNAPSHOT
+        history.storeHistory("Init add nodes")
+        self.nodes[0].grNode.setSelected(True)
+        history.storeSelectionHistory("Selection changed")
+        self.nodes[0].setPos(100, 50)
+        history.storeHistory("Node moved!", setModified=True)
+
+        history.undo()
+        self.assertEqual(self.nodes[0].getPos(), (0, 0))
+        self.assertTrue(self.nodes[0].grNode.isSelected())
+
+    def test_006_transaction(self):
+        """Test if edits inside a transaction are stored as one stamp with one notification."""
+        notifications = []
+        self.scene.addHasBeenModifiedListener(lambda: notifications.append(True))
+        data = self.scene.serialize()
+        stack_size = len(self.scene.history.history_stack)
+
+        with self.scene.transaction("Script edits"):
+            with self.scene.transaction("Delete selected"):
+                self.nodes[1].remove()
+                self.scene.history.storeHistory("Delete selected", setModified=True)
+            self.nodes[0].setPos(-100, 0)
+            self.assertEqual(notifications, [])
+
+        self.assertEqual(len(notifications), 1)
+        self.assertEqual(len(self.scene.history.history_stack), stack_size + 1)
+        self.assertEqual(self.scene.history.history_stack[-1]['desc'], "Script edits")
+
+        self.scene.history.undo()
+        restored = self.scene.serialize()
+        self.assertEqual(sorted(restored['nodes'], key=lambda node: node['id']),
+                         sorted(data['nodes'], key=lambda node: node['id']))
+
+    def test_007_memory_budget(self):
+        """Test if snapshots share unchanged records and old stamps are dropped by memory."""
+        history = self.scene.history
+        history.mode = HISTORY_MODE_SNAPSHOT
+        history.storeHistory("Init add nodes")
+        first_usage = history.getMemoryUsage()
+        self.nodes[0].setPos(100, 50)
+        history.storeHistory("Node moved!", setModified=True)
+        self.assertLess(history.getMemoryUsage() - first_usage, first_usage / 2)
+
+        history.undo()
+        self.nodes[1].setPos(0, 70)
+        history.storeHistory("Node moved!", setModified=True)
+
+        # the usage is the same as counting the remaining stamps from scratch
+        fresh = SceneHistory(self.scene)
+        for history_stamp in history.history_stack:
+            fresh.acquireStamp(history_stamp)
+        self.assertEqual(history.getMemoryUsage(), fresh.getMemoryUsage())
+
+        history.history_memory_limit = history.getMemoryUsage()
+        self.nodes[2].setPos(0, 90)
+        history.storeHistory("Node moved!", setModified=True)
+        self.assertLessEqual(history.getMemoryUsage(), history.history_memory_limit)
+        self.assertEqual(history.history_current_step, len(history.history_stack) - 1)
+        self.assertLess(len(history.history_stack), 4)
+
+    def test_008_merge_moves(self):
+        """Test if repeated moves of the same nodes are merged into one stamp."""
+        history = self.scene.history
+        stack_size = len(history.history_stack)
+        for x in (10, 20, 30):
+            self.nodes[0].setPos(x, 0)
+            history.storeMoveHistory("Node moved!", [self.nodes[0]])
+        self.assertEqual(len(history.history_stack), stack_size + 1)
+        self.assertEqual(history.history_stack[-1]['changes']['nodes_moved'],
+                         [[self.nodes[0].id, 0, 0, 30, 0]])
+
+        # other nodes or a late move get their own stamp
+        self.nodes[1].setPos(0, 10)
+        history.storeMoveHistory("Node moved!", [self.nodes[1]])
+        history.move_merge_interval = -1
+        self.nodes[1].setPos(0, 20)
+        history.storeMoveHistory("Node moved!", [self.nodes[1]])
+        self.assertEqual(len(history.history_stack), stack_size + 3)
+
+        for i in range(3):
+            history.undo()
+        self.assertEqual(self.nodes[0].getPos(), (0, 0))
+        self.assertEqual(self.nodes[1].getPos(), (0, 0))
+
+    def test_009_journal(self):
+        """Test if old stamps are paged out to the journal and a new scene recovers from it."""
+        handle, filename = tempfile.mkstemp(suffix='.journal')
+        os.close(handle)
+        self.addCleanup(os.remove, filename)
+
+        history = self.scene.history
+        history.journal_memory_stamps = 2
+        history.startJournal(SceneJournal(filename))
+        for x in range(1, 6):
+            self.nodes[0].setPos(x * 10, 0)
+            history.storeHistory("Node moved!", setModified=True)
+        self.nodes[2].remove()
+        history.storeHistory("Delete selected", setModified=True)
+        self.assertIsNone(history.history_stack[0])
+        self.assertIsNotNone(history.history_stack[-1])
+
+        for i in range(3):
+            history.undo()
+        self.assertEqual(self.nodes[0].getPos(), (30, 0))
+        self.assertEqual(len(self.scene.nodes), 3)
+        history.redo()
+
+        # the journal is left behind like after a crash
+        scene = Scene()
+        scene.history.recoverJournal(SceneJournal(filename))
+        scene.history.journal.close()
+        self.assertEqual(scene.history.history_current_step, history.history_current_step)
+        self.assertEqual(sorted(node.getPos() for node in scene.nodes),
+                         sorted(node.getPos() for node in self.scene.nodes))
+        self.assertEqual(len(scene.edges), len(self.scene.edges))
+        history.journal.close()
+
+    def test_010_undo_delete_then_add(self):
+        """Test if nodes added after undoing a delete keep all nodes in the scene."""
+        nodes = [Node(self.scene, "Node", inputs=[0], outputs=[1]) for i in range(5)]
+        self.scene.history.storeHistory("Add nodes")
+        self.scene.removeItems(nodes[:3])
+        self.scene.history.storeHistory("Delete selected", setModified=True)
+        gc.collect()
+        self.scene.history.undo()
+        for i in range(5):
+            Node(self.scene, "Node", inputs=[0], outputs=[1])
+        self.assertEqual(len(self.scene.nodes), len(self.nodes) + 10)
+        self.assertEqual(len(self.scene.serialize()['nodes']), len(self.nodes) + 10)
+
+    def test_011_undo_clear(self):
+        """Test if undo brings back the nodes of a cleared or deserialized scene."""
+        data = self.scene.serialize()
+        self.scene.clear()
+        self.scene.history.storeHistory("Clear", setModified=True)
+        self.scene.history.undo()
+        self.assertEqual(len(self.scene.nodes), 3)
+        self.assertEqual(len(self.scene.edges), 2)
+
+        Node(self.scene, "Other")
+        self.scene.history.storeHistory("Add node", setModified=True)
+        self.scene.deserialize(data)
+        self.scene.history.storeHistory("Deserialize", setModified=True)
+        self.scene.history.undo()
+        self.assertEqual(len(self.scene.nodes), 4)
+        self.assertEqual(len(self.scene.edges), 2)
+
+    def test_012_snapshot_patch_content(self):
+        """Test if restoring by patch brings back the content like restoring by deserialize."""
+        self.scene.history.mode = HISTORY_MODE_SNAPSHOT
+        self.nodes[0]._content_data = {'v': 1}
+        self.scene.history.storeHistory("Init content")
+        self.nodes[0]._content_data = {'v': 2}
+        self.scene.history.storeHistory("Edit content", setModified=True)
+
+        self.scene.history.undo()
+        self.assertIs(self.scene.getNodeById(self.nodes[0].id), self.nodes[0])
+        self.assertEqual(self.nodes[0].serialize()['content'], {'v': 1})
+
+    def test_013_stop_journal(self):
+        """Test if stopping the journal keeps the stamps in memory and drops the others when it is removed."""
+        handle, filename = tempfile.mkstemp(suffix='.journal')
+        os.close(handle)
+        self.addCleanup(lambda: os.path.exists(filename) and os.remove(filename))
+
+        history = self.scene.history
+        history.mode = HISTORY_MODE_SNAPSHOT
+        history.journal_memory_stamps = 3
+        for remove in (False, True):
+            self.nodes[0].setPos(0, 0)
+            history.startJournal(SceneJournal(filename))
+            for x in range(1, 6):
+                self.nodes[0].setPos(x * 10, 0)
+                history.storeHistory("Node moved!", setModified=True)
+                self.scene.grScene.clearSelection()
+                self.nodes[x % 3].grNode.setSelected(True)
+                history.storeSelectionHistory("Selection changed")
+            history.stopJournal(remove)
+            self.assertNotIn(None, history.history_stack)
+            self.assertEqual(history.history_current_step, len(history.history_stack) - 1)
+
+            while history.history_current_step > 0:
+                history.undo()
+            self.assertEqual(self.nodes[0].getPos(), (0, 0) if not remove else (40, 0))
+        self.assertFalse(os.path.exists(filename))
+
+    def test_014_transaction_snapshot(self):
+        """Test if edits inside a transaction are stamped in snapshot mode without storing history."""
+        history = self.scene.history
+        history.mode = HISTORY_MODE_SNAPSHOT
+        history.storeHistory("Init add nodes")
+        stack_size = len(history.history_stack)
+
+        with self.scene.transaction("Script edits"):
+            self.nodes[0].setPos(-100, 0)
+            Node(self.scene, "Script node")
+        self.assertEqual(len(history.history_stack), stack_size + 1)
+        self.assertTrue(self.scene.has_been_modified)
+        self.assertFalse(history.hasChanges())
+
+        history.undo()
+        self.assertEqual(self.nodes[0].getPos(), (0, 0))
+        self.assertEqual(len(self.scene.nodes), 3)
+        self.assertFalse(history.hasChanges())
+
+        with self.scene.transaction("Nothing"):
+            pass
+        self.assertEqual(len(history.history_stack), stack_size + 1)
@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+
+"""Tests for saving and loading scene files."""
+
+import io
+import json
+import os
+import stat
+import tempfile
+import unittest
+
+from xynodeeditor.node_scene import Scene
+from xynodeeditor.node_node import Node
+from xynodeeditor.node_edge import EDGE_TYPE_BEZIER, Edge
+from xynodeeditor.node_scene_stream import (FILE_FORMAT_BINARY, FILE_FORMAT_JSON, NEW_FILE_MODE, SceneStreamReader,
+                                             dumpScene, writeSceneFile)
+
+
+class TestSceneFiles(unittest.TestCase):
+    """Tests for scene files of headless scenes."""
+
+    def setUp(self):
+        """Set up a headless scene with a few connected nodes."""
+        self.scene = Scene(headless=True)
+        nodes = [Node(self.scene, "Node %d" % i, inputs=[0, 1], outputs=[2]) for i in range(5)]
+        for i, node in enumerate(nodes[1:]):
+            node.setPos(i * 200.5, -i * 100)
+            Edge(self.scene, nodes[i].outputs[0], node.inputs[0], EDGE_TYPE_BEZIER)
+        handle, self.filename = tempfile.mkstemp(suffix='.json')
+        os.close(handle)
+
+    def tearDown(self):
+        """Remove the scene file."""
+        os.remove(self.filename)
+
+    def test_000_dump_like_json(self):
+        """Test if the streamed file is the same as json.dumps with indent."""
+        data = self.scene.serialize()
+        file = io.StringIO()
+        dumpScene(self.scene.serializeIter(), file)
+        self.assertEqual(file.getvalue(), json.dumps(data, indent=4))
+
+        data['edges'] = []
+        file = io.StringIO()
+        dumpScene(data, file)
+        self.assertEqual(file.getvalue(), json.dumps(data, indent=4))
+
+    def test_001_stream_reader(self):
+        """Test if the reader yields nodes and edges one by one across chunks."""
+        data = self.scene.serialize()
+        file = io.StringIO(json.dumps(data))
+        items = list(SceneStreamReader(file, chunk_size=7))
+        self.assertEqual(items[0], ('id', data['id']))
+        self.assertEqual([value for key, value in items if key == 'nodes'], data['nodes'])
+        self.assertEqual([value for key, value in items if key == 'edges'], data['edges'])
+
+    def test_002_save_load(self):
+        """Test if a saved scene loads back the same."""
+        self.scene.saveToFile(self.filename)
+        scene = Scene(headless=True)
+        scene.loadFromFile(self.filename)
+        self.assertEqual(scene.serialize(), self.scene.serialize())
+
+    def test_003_save_load_binary(self):
+        """Test if a scene saved in the binary format loads back the same."""
+        self.scene.saveToFile(self.filename, FILE_FORMAT_BINARY)
+        with open(self.filename, 'rb') as file:
+            self.assertEqual(file.read(4), b'XYNB')
+        scene = Scene(headless=True)
+        scene.loadFromFile(self.filename)
+        self.assertEqual(scene.serialize(), self.scene.serialize())
+
+    def test_004_failed_save_keeps_file(self):
+        """Test if a failing save leaves the old file and no temporary file behind."""
+        self.scene.saveToFile(self.filename)
+        with open(self.filename) as file:
+            saved = file.read()
+
+        data = self.scene.serialize()
+        data['nodes'].append({'id': object()})
+        with self.assertRaises(TypeError):
+            writeSceneFile(data, self.filename)
+
+        with open(self.filename) as file:
+            self.assertEqual(file.read(), saved)
+        directory, basename = os.path.split(self.filename)
+        self.assertEqual([name for name in os.listdir(directory) if name.startswith('.' + basename)], [])
+
+    def test_005_background_save(self):
+        """Test if the scene saver writes the snapshot taken when saving was requested."""
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+        from PySide2.QtCore import QCoreApplication
+        from xynodeeditor.node_scene_saver import SceneSaver
+
+        app = QCoreApplication.instance() or QCoreApplication([])
+        saver = SceneSaver()
+        finished = []
+        saver.saveFinished.connect(finished.append)
+
+        data = self.scene.serialize()
+        self.scene.has_been_modified = True
+        saver.save(self.scene, self.filename)
+        self.assertFalse(self.scene.has_been_modified)
+        # changes made while saving are not in the file
+        Node(self.scene, "Late node", inputs=[], outputs=[])
+
+        saver.wait()
+        app.processEvents()
+        self.assertEqual(finished, [self.filename])
+        with open(self.filename) as file:
+            self.assertEqual(json.load(file), data)
+
+    def test_006_save_keeps_mode(self):
+        """Test if saving keeps the mode of an existing file and gives new files the default mode."""
+        os.chmod(self.filename, 0o644)
+        self.scene.saveToFile(self.filename)
+        self.assertEqual(stat.S_IMODE(os.stat(self.filename).st_mode), 0o644)
+
+        os.remove(self.filename)
+        self.scene.saveToFile(self.filename, FILE_FORMAT_BINARY)
+        self.assertEqual(stat.S_IMODE(os.stat(self.filename).st_mode), NEW_FILE_MODE)
+
+    def test_007_load_truncated_file(self):
+        """Test if loading a truncated file raises and leaves the open scene as it was."""
+        big_scene = Scene(headless=True)
+        nodes = [Node(big_scene, "Node %d" % i, inputs=[0], outputs=[1]) for i in range(50)]
+        for node1, node2 in zip(nodes, nodes[1:]):
+            Edge(big_scene, node1.outputs[0], node2.inputs[0], EDGE_TYPE_BEZIER)
+        self.scene.history.storeHistory("Init add nodes")
+        data = self.scene.serialize()
+        self.scene.has_been_modified = True
+
+        for file_format in (FILE_FORMAT_JSON, FILE_FORMAT_BINARY):
+            big_scene.saveToFile(self.filename, file_format)
+            with open(self.filename, 'rb+') as file:
+                file.truncate(os.path.getsize(self.filename) // 2)
+
+            with self.assertRaises(Exception):
+                self.scene.loadFromFile(self.filename)
+            self.assertEqual(self.scene.serialize(), data)
+            self.assertTrue(self.scene.has_been_modified)
+            self.assertFalse(self.scene.history.hasChanges())
+
+    def test_008_failed_background_save(self):
+        """Test if waiting for the scene saver reports a failed save and marks the scene modified again."""
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+        from PySide2.QtCore import QCoreApplication
+        from xynodeeditor.node_scene_saver import SceneSaver
+
+        QCoreApplication.instance() or QCoreApplication([])
+        saver = SceneSaver()
+        filename = os.path.join(self.filename + '.missing', 'scene.json')
+        saver.save(self.scene, filename)
+
+        failures = saver.wait()
+        self.assertEqual([failed for failed, error in failures], [filename])
+        self.assertTrue(self.scene.has_been_modified)
+        self.assertEqual(saver.wait(), [])
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+
+"""Tests for evaluation of `Node` values."""
+
+import unittest
+
+from xynodeeditor.node_scene import Scene
+from xynodeeditor.node_node import Node
+from xynodeeditor.node_edge import EDGE_TYPE_BEZIER, Edge
+
+
+class CountingNode(Node):
+    """Adds 1 to the sum of its inputs, or returns its constant."""
+
+    def __init__(self, scene, constant=None):
+        super().__init__(scene, "Add", inputs=[1, 1], outputs=[1])
+        self.constant = constant
+        self.evaluations = 0
+
+    def evalImplementation(self):
+        self.evaluations += 1
+        if self.constant is not None:
+            return self.constant
+        return sum(node.eval() for index in range(len(self.inputs)) for node in self.getInputs(index)) + 1
+
+
+class TestNodeEval(unittest.TestCase):
+    """Tests for dirty propagation and lazy evaluation."""
+
+    def setUp(self):
+        """Set up two constants feeding two separate chains."""
+        self.scene = Scene(headless=True)
+        self.const1 = CountingNode(self.scene, 1)
+        self.const2 = CountingNode(self.scene, 10)
+        self.chain1 = self.createChain(self.const1, 3)
+        self.chain2 = self.createChain(self.const2, 3)
+
+    def createChain(self, first, count):
+        nodes = [first]
+        for i in range(count):
+            nodes.append(CountingNode(self.scene))
+            Edge(self.scene, nodes[-2].outputs[0], nodes[-1].inputs[0], EDGE_TYPE_BEZIER)
+        return nodes
+
+    def test_000_eval(self):
+        """Test if values flow along edges and are cached."""
+        self.assertEqual(self.chain1[-1].eval(), 4)
+        self.assertEqual(self.chain2[-1].eval(), 13)
+        self.chain1[-1].eval()
+        self.assertEqual([node.evaluations for node in self.chain1], [1, 1, 1, 1])
+
+    def test_001_dirty_descendants(self):
+        """Test if changing an input recomputes only the nodes depending on it."""
+        self.chain1[-1].eval()
+        self.chain2[-1].eval()
+        self.const1.constant = 5
+        self.const1.onInputChanged()
+        self.assertTrue(all(node.isDirty() for node in self.chain1))
+        self.assertFalse(any(node.isDirty() for node in self.chain2))
+
+        self.assertEqual(self.chain1[-1].eval(), 8)
+        self.assertEqual([node.evaluations for node in self.chain1], [2, 2, 2, 2])
+        self.assertEqual([node.evaluations for node in self.chain2], [1, 1, 1, 1])
+
+        # connecting a second input changes the value too
+        Edge(self.scene, self.const2.outputs[0], self.chain1[2].inputs[1], EDGE_TYPE_BEZIER)
+        self.assertEqual(self.chain1[-1].eval(), 18)
+        self.assertEqual(self.chain1[1].evaluations, 2)
+
+    def test_002_long_chain(self):
+        """Test if a chain longer than the recursion limit is evaluated."""
+        chain = self.createChain(CountingNode(self.scene, 0), 5000)
+        self.assertEqual(chain[-1].eval(), 5000)
+
+    def test_003_invalid(self):
+        """Test if a failed node makes the nodes depending on it invalid until it is fixed."""
+        self.chain1[-1].eval()
+        self.const1.constant = "x"
+        self.const1.onInputChanged()
+        self.assertIsNone(self.chain1[-1].eval())
+        self.assertTrue(self.chain1[1].isInvalid())
+        self.assertTrue(self.chain1[-1].isInvalid())
+        self.assertEqual(self.chain1[-1].evaluations, 1)
+
+        self.const1.constant = 2
+        self.const1.onInputChanged()
+        self.assertEqual(self.chain1[-1].eval(), 5)
+        self.assertFalse(self.chain1[-1].isInvalid())
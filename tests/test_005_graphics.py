@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+
+"""Tests for the graphics of scenes."""
+
+import os
+import unittest
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PySide2.QtCore import QLine, QPointF, QRectF
+from PySide2.QtGui import QColor, QImage, QPainter
+from PySide2.QtWidgets import QApplication, QStyleOptionGraphicsItem
+
+from xynodeeditor.node_scene import Scene
+from xynodeeditor.node_node import Node
+from xynodeeditor.node_edge import EDGE_TYPE_BEZIER, Edge
+from xynodeeditor.node_graphics_node import NODE_LOD_DETAIL
+from xynodeeditor.node_graphics_view import QDMGraphicsView
+
+
+app = QApplication.instance() or QApplication([])
+
+
+def drawGridLines(grScene, painter, rect):
+    """Draws the grid line by line like drawBackground did before the tiles were cached."""
+    left, right, top, bottom = int(rect.left()), int(rect.right()), int(rect.top()), int(rect.bottom())
+    lines_light, lines_dark = [], []
+    for x in range(left - left % grScene.gridSize, right, grScene.gridSize):
+        lines = lines_dark if x % (grScene.gridSize * grScene.gridSquares) == 0 else lines_light
+        lines.append(QLine(x, top, x, bottom))
+    for y in range(top - top % grScene.gridSize, bottom, grScene.gridSize):
+        lines = lines_dark if y % (grScene.gridSize * grScene.gridSquares) == 0 else lines_light
+        lines.append(QLine(left, y, right, y))
+    painter.setPen(grScene._pen_light)
+    painter.drawLines(lines_light)
+    painter.setPen(grScene._pen_dark)
+    painter.drawLines(lines_dark)
+
+
+def renderImage(draw, rect, scale=1.0):
+    """Renders the scene rect by draw(painter) into an image."""
+    image = QImage(int(rect.width() * scale), int(rect.height() * scale), QImage.Format_ARGB32)
+    image.fill(QColor("#393939"))
+    painter = QPainter(image)
+    painter.scale(scale, scale)
+    painter.translate(-rect.left(), -rect.top())
+    draw(painter)
+    painter.end()
+    return image
+
+
+class TestCutLine(unittest.TestCase):
+    """Tests for cutting edges with the cut line."""
+
+    def setUp(self):
+        """Set up one node connected to a node above and a node below it."""
+        self.scene = Scene()
+        self.view = QDMGraphicsView(self.scene.grScene)
+        node = Node(self.scene, "Source", inputs=[], outputs=[1])
+        upper = Node(self.scene, "Upper", inputs=[1], outputs=[])
+        upper.setPos(400, -1000)
+        lower = Node(self.scene, "Lower", inputs=[1], outputs=[])
+        lower.setPos(400, 1000)
+        self.upper_edge = Edge(self.scene, node.outputs[0], upper.inputs[0], EDGE_TYPE_BEZIER)
+        self.lower_edge = Edge(self.scene, node.outputs[0], lower.inputs[0], EDGE_TYPE_BEZIER)
+        self.scene.history.storeHistory("Init add nodes")
+
+    def test_000_cut_one_edge(self):
+        """Test if a cut removes only the edge it crosses, with one history stamp."""
+        stack_size = len(self.scene.history.history_stack)
+        for point in (QPointF(290, -800), QPointF(291, -799), QPointF(290, -50)):
+            self.view.cutline.addPoint(point, min_distance=4)
+        self.assertEqual(len(self.view.cutline.line_points), 2)
+
+        self.view.cutIntersectingEdges()
+        self.assertEqual(self.scene.edges, [self.lower_edge])
+        self.assertEqual(len(self.scene.history.history_stack), stack_size + 1)
+
+        self.scene.history.undo()
+        self.assertEqual(len(self.scene.edges), 2)
+
+
+class TestGraphics(unittest.TestCase):
+    """Tests for the cached grid and the level of detail of nodes."""
+
+    def setUp(self):
+        """Set up a scene with one node."""
+        self.scene = Scene()
+        self.node = Node(self.scene, "Node", inputs=[1], outputs=[1])
+
+    def test_000_cached_grid(self):
+        """Test if the grid drawn from cached tiles is the same as the grid drawn line by line."""
+        grScene = self.scene.grScene
+        rect = QRectF(-230, -170, 460, 340)
+        cached = renderImage(lambda painter: grScene.drawBackground(painter, rect), rect)
+        uncached = renderImage(lambda painter: drawGridLines(grScene, painter, rect), rect)
+        self.assertEqual(cached, uncached)
+
+    def test_001_node_lod(self):
+        """Test if a node drawn below the detail level has no title and content."""
+        grNode = self.node.grNode
+        rect = grNode.boundingRect()
+        title_pixel = (int(rect.width() / 2), int(grNode.title_height / 2))
+        option = QStyleOptionGraphicsItem()
+
+        scale = NODE_LOD_DETAIL / 2
+        image = renderImage(lambda painter: grNode.paint(painter, option), rect, scale)
+        self.assertNotEqual(image.pixelColor(*[int(v * scale) for v in title_pixel]), QColor("#313131"))
+        self.assertNotIn(grNode, self.scene.grScene._pending_content)
+        empty = renderImage(lambda painter: None, rect, scale)
+        self.assertEqual(renderImage(lambda painter: grNode.title_item.paint(painter, option), rect, scale), empty)
+
+        image = renderImage(lambda painter: grNode.paint(painter, option), rect)
+        self.assertEqual(image.pixelColor(*title_pixel), QColor("#313131"))
+        self.assertIn(grNode, self.scene.grScene._pending_content)
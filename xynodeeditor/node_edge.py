@@ -1,6 +1,5 @@
 from collections import OrderedDict
 from xynodeeditor.node_serializable import Serializable
-from xynodeeditor.node_graphics_edge import QDMGraphicsEdgeDirect, QDMGraphicsEdgeBezier
 
 EDGE_TYPE_DIRECT = 1
 EDGE_TYPE_BEZIER = 2
@@ -16,6 +15,8 @@ class Edge(Serializable):
         # default init
         self._start_socket = None
         self._end_socket = None
+        self.grEdge = None
+        self._serialized = None
 
         self.start_socket = start_socket
         self.end_socket = end_socket
@@ -35,11 +36,14 @@ class Edge(Serializable):
         # if we were assigned to some socket before, delete us from the socket
         if self._start_socket is not None:
             self._start_socket.removeEdge(self)
+            self.scene.graph.removeEdge(self)
 
         # assign new start socket
         self._start_socket = value
+        self.invalidateSerialized()
         # addEdge to the socket class
         if self.start_socket is not None:
+            self.scene.graph.addEdge(self)
             self.start_socket.addEdge(self)
 
     @property
@@ -51,11 +55,14 @@ class Edge(Serializable):
         # if we were assigned to some socket before, delete us from the socket
         if self._end_socket is not None:
             self._end_socket.removeEdge(self)
+            self.scene.graph.removeEdge(self)
 
         # assign new end socket
         self._end_socket = value
+        self.invalidateSerialized()
         # addEdge to the socket class
         if self.end_socket is not None:
+            self.scene.graph.addEdge(self)
             self.end_socket.addEdge(self)
 
     @property
@@ -64,10 +71,20 @@ class Edge(Serializable):
 
     @edge_type.setter
     def edge_type(self, value):
-        if hasattr(self, 'grEdge') and self.grEdge is not None:
+        if self.grEdge is not None:
             self.scene.grScene.removeItem(self.grEdge)
+            self.grEdge = None
 
         self._edge_type = value
+        self.invalidateSerialized()
+        if self.scene.isUIDeferred():
+            self.scene.deferEdgeUI(self)
+        elif self.scene.grScene is not None:
+            self.initUI()
+
+    def initUI(self):
+        from xynodeeditor.node_graphics_edge import QDMGraphicsEdgeDirect, QDMGraphicsEdgeBezier
+
         if self.edge_type == EDGE_TYPE_DIRECT:
             self.grEdge = QDMGraphicsEdgeDirect(self)
         elif self.edge_type == EDGE_TYPE_BEZIER:
@@ -75,12 +92,15 @@ class Edge(Serializable):
         else:
             self.grEdge = QDMGraphicsEdgeBezier(self)
 
-        self.scene.grScene.addItem(self.grEdge)
-
+        # outside of the scene moving the ends does not compute the path, it is computed once when added
         if self.start_socket is not None:
             self.updatePositions()
 
+        self.scene.grScene.addItem(self.grEdge)
+
     def updatePositions(self):
+        if self.grEdge is None:
+            return
         source_pos = self.start_socket.getSocketPosition()
         source_pos[0] += self.start_socket.node.grNode.pos().x()
         source_pos[1] += self.start_socket.node.grNode.pos().y()
@@ -103,38 +123,58 @@ class Edge(Serializable):
         self.start_socket = None
         self.end_socket = None
 
+    def getOtherSocket(self, known_socket):
+        return self.start_socket if known_socket is self.end_socket else self.end_socket
+
+    def isAttached(self):
+        return self.scene.getEdgeById(self.id) is self
+
     def remove(self):
-        if self.grEdge in self.scene.grScene.items():
-            if DEBUG:
-                print("> Removing Edge", self)
+        # removed already, e.g. together with the node on its other end
+        if not self.isAttached():
+            return
 
-            if DEBUG:
-                print("  - remove edge from all sockets")
-            self.remove_from_sockets()
+        if DEBUG:
+            print("> Removing Edge", self)
 
-            if DEBUG:
-                print("  - remove grEdge")
+        if DEBUG:
+            print("  - remove edge from scene")
+        self.scene.removeEdge(self)
+
+        if DEBUG:
+            print("  - remove edge from all sockets")
+        self.remove_from_sockets()
+
+        if DEBUG:
+            print("  - remove grEdge")
+        if self.grEdge is not None:
             self.scene.grScene.removeItem(self.grEdge)
             self.grEdge = None
 
-            if DEBUG:
-                print("  - remove edge from scene")
-            self.scene.removeEdge(self)
+        if DEBUG:
+            print("  - everything is done")
+
+    def isSameAs(self, data):
+        return self.edge_type == data['edge_type'] and \
+            self.start_socket is not None and self.start_socket.id == data['start'] and \
+            self.end_socket is not None and self.end_socket.id == data['end']
 
-            if DEBUG:
-                print("  - everything is done")
+    def invalidateSerialized(self):
+        self._serialized = None
 
     def serialize(self):
-        return OrderedDict([
-            ('id', self.id),
-            ('edge_type', self.edge_type),
-            ('start', self.start_socket.id),
-            ('end', self.end_socket.id),
-        ])
+        if self._serialized is None:
+            self._serialized = OrderedDict([
+                ('id', self.id),
+                ('edge_type', self.edge_type),
+                ('start', self.start_socket.id),
+                ('end', self.end_socket.id),
+            ])
+        return self._serialized
 
     def deserialize(self, data, hashmap={}, restore_id=True):
         if restore_id:
-            self.id = data['id']
+            self.scene.reindexEdge(self, data['id'])
         self.start_socket = hashmap[data['start']]
         self.end_socket = hashmap[data['end']]
         self.edge_type = data['edge_type']
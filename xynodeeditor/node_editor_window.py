@@ -4,15 +4,25 @@ import json
 from PySide2.QtCore import QPoint, QSettings, QSize
 from PySide2.QtWidgets import QAction, QApplication, QFileDialog, QLabel, QMainWindow, QMessageBox
 from xynodeeditor.node_editor_widget import NodeEditorWidget
+from xynodeeditor.node_scene_journal import SceneJournal
+from xynodeeditor.node_scene_saver import SceneSaver
 
 
 class NodeEditorWindow(QMainWindow):
+    # keep the history of open files in a journal next to them, edits survive a crash
+    use_journal = False
+
     def __init__(self):
         super().__init__()
 
         self.name_company = 'Mathlovart'
         self.name_product = 'XYNodeEditor'
 
+        # files are written in the background, the window stays responsive
+        self.scene_saver = SceneSaver(self)
+        self.scene_saver.saveFinished.connect(self.onFileSaved)
+        self.scene_saver.saveFailed.connect(self.onFileSaveFailed)
+
         self.initUI()
 
     def initUI(self):
@@ -82,11 +92,24 @@ class NodeEditorWindow(QMainWindow):
         self.setWindowTitle(title)
 
     def closeEvent(self, event):
-        if self.maybeSave():
+        # a save which failed before makes the scene modified, maybeSave() asks about it
+        self.scene_saver.wait()
+        # do not quit before the last save is on disk
+        if self.maybeSave() and self.waitForSaves():
+            self.getCurrentNodeEditorWidget().scene.history.stopJournal()
             event.accept()
         else:
             event.ignore()
 
+    def waitForSaves(self):
+        ''' waits for the files being saved, returns False and tells the user if any of them failed '''
+        failures = self.scene_saver.wait()
+        if failures:
+            QMessageBox.warning(
+                self, "Saving failed",
+                "\n".join("Saving %s failed: %s" % (filename, error) for filename, error in failures))
+        return not failures
+
     def isModified(self):
         return self.getCurrentNodeEditorWidget().scene.has_been_modified
 
@@ -114,7 +137,9 @@ class NodeEditorWindow(QMainWindow):
 
     def onFileNew(self):
         if self.maybeSave():
+            self.getCurrentNodeEditorWidget().scene.history.stopJournal()
             self.getCurrentNodeEditorWidget().scene.clear()
+            self.getCurrentNodeEditorWidget().scene.history.clear()
             self.getCurrentNodeEditorWidget().filename = None
             self.setTitle()
 
@@ -125,19 +150,55 @@ class NodeEditorWindow(QMainWindow):
             if fname == '':
                 return
             if os.path.isfile(fname):
-                self.getCurrentNodeEditorWidget().scene.loadFromFile(fname)
+                self.getCurrentNodeEditorWidget().scene.history.stopJournal()
+                try:
+                    self.getCurrentNodeEditorWidget().scene.loadFromFile(fname)
+                except Exception as e:
+                    # the scene is as it was before, keep editing the previous file
+                    QMessageBox.warning(self, "Cannot open file", "Cannot open %s:\n%s" % (fname, e))
+                    filename = self.getCurrentNodeEditorWidget().filename
+                    if self.use_journal and filename is not None:
+                        self.openJournal(filename)
+                    return
                 self.getCurrentNodeEditorWidget().filename = fname
+                if self.use_journal:
+                    self.openJournal(fname)
                 self.setTitle()
 
+    def openJournal(self, filename):
+        scene = self.getCurrentNodeEditorWidget().scene
+        journal = SceneJournal(filename + '.journal')
+        if journal.exists():
+            res = QMessageBox.question(
+                self, "Recover unsaved changes?",
+                "The last session with this file did not end properly.\n Do you want to recover its changes?")
+            if res == QMessageBox.Yes:
+                try:
+                    scene.history.recoverJournal(journal)
+                    scene.has_been_modified = True
+                    return
+                except (OSError, ValueError) as e:
+                    print("!W:", "Cannot recover journal", journal.filename, e)
+                    scene.loadFromFile(filename)
+        scene.history.startJournal(journal)
+
     def onFileSave(self):
         if self.getCurrentNodeEditorWidget().filename is None:
             return self.onFileSaveAs()
 
-        self.getCurrentNodeEditorWidget().scene.saveToFile(self.getCurrentNodeEditorWidget().filename)
-        self.statusBar().showMessage("Successfull save %s" % self.getCurrentNodeEditorWidget().filename)
+        filename = self.getCurrentNodeEditorWidget().filename
+        self.scene_saver.save(self.getCurrentNodeEditorWidget().scene, filename)
+        self.statusBar().showMessage("Saving %s ..." % filename)
         self.setTitle()
         return True
 
+    def onFileSaved(self, filename):
+        self.statusBar().showMessage("Successfull save %s" % filename)
+
+    def onFileSaveFailed(self, filename, error):
+        self.statusBar().showMessage("Saving %s failed: %s" % (filename, error))
+        self.setTitle()
+
     def onFileSaveAs(self):
         # print('On File Save As clicked!')
         fname, filter = QFileDialog.getSaveFileName(self, 'Save graph to file')
@@ -15,6 +15,14 @@ class QDMCutLine(QGraphicsItem):
 
         self.setZValue(2)
 
+    def addPoint(self, point, min_distance=0):
+        ''' appends point unless it is closer than min_distance to the last one '''
+        if self.line_points:
+            delta = point - self.line_points[-1]
+            if delta.x() * delta.x() + delta.y() * delta.y() < min_distance * min_distance:
+                return
+        self.line_points.append(point)
+
     def boundingRect(self):
         return self.shape().boundingRect()
 
@@ -2,11 +2,23 @@ import math
 
 from PySide2.QtCore import QPointF, Qt
 from PySide2.QtGui import QColor, QPainter, QPainterPath, QPen
-from PySide2.QtWidgets import QGraphicsPathItem
+from PySide2.QtWidgets import QGraphicsPathItem, QStyleOptionGraphicsItem
 
 from xynodeeditor.node_socket import LEFT_BOTTOM, LEFT_TOP, RIGHT_BOTTOM, RIGHT_TOP
 
 EDGE_CP_ROUNDNESS = 100
+# below this level of detail edges are drawn as straight lines
+EDGE_LOD_CURVE = 0.5
+
+# all edges share their pens
+EDGE_COLOR = QColor("#0f0f0f")  # 多一位都不显示 #00100000 错误
+EDGE_PEN = QPen(EDGE_COLOR)
+EDGE_PEN.setWidthF(2.0)
+EDGE_PEN_SELECTED = QPen(QColor("#00ff00"))
+EDGE_PEN_SELECTED.setWidthF(2.0)
+EDGE_PEN_DRAGGING = QPen(EDGE_COLOR)
+EDGE_PEN_DRAGGING.setWidthF(2.0)
+EDGE_PEN_DRAGGING.setStyle(Qt.DashLine)
 
 
 class QDMGraphicsEdge(QGraphicsPathItem):
@@ -15,17 +27,9 @@ class QDMGraphicsEdge(QGraphicsPathItem):
 
         self.edge = edge
 
-        self._color = QColor("#0f0f0f")  # 多一位都不显示 #00100000 错误
-        self._pen = QPen(self._color)
-        self._pen.setWidthF(2.0)
-
-        self._color_selected = QColor("#00ff00")
-        self._pen_selected = QPen(self._color_selected)
-        self._pen_selected.setWidthF(2.0)
-
-        self._pen_dragging = QPen(self._color)
-        self._pen_dragging.setWidthF(2.0)
-        self._pen_dragging.setStyle(Qt.DashLine)
+        self._pen = EDGE_PEN
+        self._pen_selected = EDGE_PEN_SELECTED
+        self._pen_dragging = EDGE_PEN_DRAGGING
 
         self.setFlag(QGraphicsPathItem.ItemIsSelectable)
 
@@ -34,33 +38,53 @@ class QDMGraphicsEdge(QGraphicsPathItem):
         self.posSource = [0, 0]
         self.posDestination = [200, 100]
 
+        # path and bounding rect are rebuilt only when an end point moves
+        self._path = None
+        self._bounding_rect = None
+
     def setSource(self, x, y):
-        self.posSource = [x, y]
+        if self.posSource != [x, y]:
+            self.prepareGeometryChange()
+            self.posSource = [x, y]
+            self._path = None
 
     def setDestination(self, x, y):
-        self.posDestination = [x, y]
+        if self.posDestination != [x, y]:
+            self.prepareGeometryChange()
+            self.posDestination = [x, y]
+            self._path = None
+
+    def getPath(self):
+        if self._path is None:
+            self._path = self.calcPath()
+            # keep straight edges from getting an empty rect in the scene index
+            margin = self._pen.widthF()
+            self._bounding_rect = self._path.boundingRect().adjusted(-margin, -margin, margin, margin)
+        return self._path
 
     def boundingRect(self):
-        return self.shape().boundingRect()
+        self.getPath()
+        return self._bounding_rect
 
     def shape(self):
-        return self.calcPath()
+        return self.getPath()
 
     def paint(self, painter: QPainter, option, widget=None):
-        self.setPath(self.calcPath())
-
         if self.edge.end_socket is None:
             painter.setPen(self._pen_dragging)
         else:
             painter.setPen(self._pen_selected if self.isSelected() else self._pen)
         painter.setBrush(Qt.NoBrush)
-        painter.drawPath(self.path())
+
+        if QStyleOptionGraphicsItem.levelOfDetailFromTransform(painter.worldTransform()) < EDGE_LOD_CURVE:
+            painter.drawLine(QPointF(*self.posSource), QPointF(*self.posDestination))
+            return
+        painter.drawPath(self.getPath())
 
     def intersectsWith(self, p1, p2):
         cutpath = QPainterPath(p1)
         cutpath.lineTo(p2)
-        path = self.calcPath()
-        return cutpath.intersects(path)
+        return cutpath.intersects(self.getPath())
 
     def calcPath(self):
         ''' Will handle drawing QPainterPath from Point A to B'''
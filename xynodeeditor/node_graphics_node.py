@@ -1,6 +1,20 @@
-from PySide2.QtCore import QRectF, Qt
-from PySide2.QtGui import QBrush, QColor, QFont, QPainterPath, QPen
-from PySide2.QtWidgets import QGraphicsItem, QGraphicsProxyWidget, QGraphicsTextItem
+from PySide2.QtCore import QRect, QRectF, Qt
+from PySide2.QtGui import QBrush, QColor, QFont, QFontMetricsF, QPainterPath, QPen
+from PySide2.QtWidgets import QGraphicsItem, QGraphicsProxyWidget, QGraphicsSimpleTextItem, QStyleOptionGraphicsItem
+
+# below this level of detail nodes are drawn as flat rectangles without title and content
+NODE_LOD_DETAIL = 0.5
+
+# nodes of the same size share their paths, keyed by (width, height, title_height, edge_size)
+_node_paths = {}
+
+# all titles look the same, there is no need to create the font and brush for each node
+TITLE_FONT = QFont("Ubuntu", 10)
+TITLE_BRUSH = QBrush(QColor(Qt.white))
+
+
+def isDetailed(painter):
+    return QStyleOptionGraphicsItem.levelOfDetailFromTransform(painter.worldTransform()) >= NODE_LOD_DETAIL
 
 
 class QDMGraphicsNode(QGraphicsItem):
@@ -8,9 +22,9 @@ class QDMGraphicsNode(QGraphicsItem):
         super().__init__(parent)
 
         self.node = node
-        self.content = self.node.content
-        self._title_color = Qt.white
-        self._title_font = QFont("Ubuntu", 10)
+        self.grContent = None
+        self._title_brush = TITLE_BRUSH
+        self._title_font = TITLE_FONT
 
         self.width = 180
         self.height = 240
@@ -24,6 +38,8 @@ class QDMGraphicsNode(QGraphicsItem):
         self._brush_title = QBrush(QColor("#FF313131"))
         self._brush_background = QBrush(QColor("#E3212121"))
 
+        self.initPaths()
+
         # init title
         self.initTitle()
         self.title = self.node.title
@@ -31,28 +47,37 @@ class QDMGraphicsNode(QGraphicsItem):
         # init sockets
         self.initSockets()
 
-        # init content
-        self.initContent()
-
         self.initUI()
 
         self.wasMoved = False
 
     def mouseMoveEvent(self, event):
+        selected_nodes = self.scene().getSelectedNodes()
+        if not self.wasMoved:
+            # remember where the selection was before Qt moves it
+            for node in selected_nodes:
+                self.node.scene.history.recordMoved(node)
+
         super().mouseMoveEvent(event)
 
-        # optimize me! just update the selecetd nodes
-        for node in self.scene().scene.nodes:
-            if node.grNode.isSelected():
-                node.updateConnectedEdges()
+        for node in selected_nodes:
+            self.scene().scheduleEdgesUpdate(node)
         self.wasMoved = True
 
+    def mousePressEvent(self, event):
+        # clicking the picture of the content means the user wants to edit it
+        if self.grContent is None and self.getContentRect().contains(event.pos().toPoint()):
+            self.node.initContent()
+
+        super().mousePressEvent(event)
+
     def mouseReleaseEvent(self, event):
         super().mouseReleaseEvent(event)
+        self.scene().updateDirtyEdges()
 
         if self.wasMoved:
             self.wasMoved = False
-            self.node.scene.history.storeHistory("Node moved!", setModified=True)
+            self.node.scene.history.storeMoveHistory("Node moved!", self.scene().getSelectedNodes())
 
     @property
     def title(self):
@@ -61,28 +86,32 @@ class QDMGraphicsNode(QGraphicsItem):
     @title.setter
     def title(self, value):
         self._title = value
-        self.title_item.setPlainText(self._title)
+        # titles stay on one line, long ones are cut to the width of the node
+        width = self.width - 4 * self._padding
+        self.title_item.setText(QFontMetricsF(self._title_font).elidedText(self._title, Qt.ElideRight, width))
 
     def initUI(self):
         self.setFlag(QGraphicsItem.ItemIsSelectable)
         self.setFlag(QGraphicsItem.ItemIsMovable)
 
     def initTitle(self):
-        self.title_item = QGraphicsTextItem(self)
+        self.title_item = QDMGraphicsTitle(self)
         self.title_item.node = self.node
-        self.title_item.setDefaultTextColor(self._title_color)
+        self.title_item.setBrush(self._title_brush)
         self.title_item.setFont(self._title_font)
-        self.title_item.setPos(self._padding, 0)
-        self.title_item.setTextWidth(self.width - 2 * self._padding)
+        self.title_item.setPos(2 * self._padding, self._padding)
+
+    def getContentRect(self):
+        return QRect(self.edge_size,
+                     self.title_height + self.edge_size,
+                     self.width - 2*self.edge_size,
+                     self.height - 2*self.edge_size-self.title_height
+                     )
 
     def initContent(self):
-        self.grContent = QGraphicsProxyWidget(self)
-        self.content.setGeometry(self.edge_size,
-                                 self.title_height + self.edge_size,
-                                 self.width - 2*self.edge_size,
-                                 self.height - 2*self.edge_size-self.title_height
-                                 )
-        self.grContent.setWidget(self.content)
+        self.grContent = QDMGraphicsContent(self)
+        self.node.content.setGeometry(self.getContentRect())
+        self.grContent.setWidget(self.node.content)
 
     def initSockets(self):
         pass
@@ -90,9 +119,15 @@ class QDMGraphicsNode(QGraphicsItem):
     def boundingRect(self):
         return QRectF(0, 0, self.width, self.height).normalized()
 
-    def paint(self, painter, option, widget=None):
+    def initPaths(self):
+        # the shape of the node never changes, build the paths only once per size
+        key = (self.width, self.height, self.title_height, self.edge_size)
+        paths = _node_paths.get(key)
+        if paths is None:
+            paths = _node_paths[key] = self.createPaths()
+        self._path_title, self._path_content, self._path_outline = paths
 
-        # title
+    def createPaths(self):
         path_title = QPainterPath()
         path_title.setFillRule(Qt.WindingFill)
         path_title.addRoundedRect(0, 0, self.width, self.title_height,
@@ -103,11 +138,6 @@ class QDMGraphicsNode(QGraphicsItem):
                            self.title_height - self.edge_size, self.edge_size,
                            self.edge_size)
 
-        painter.setPen(Qt.NoPen)
-        painter.setBrush(self._brush_title)
-        painter.drawPath(path_title.simplified())
-
-        # content
         path_content = QPainterPath()
         path_content.setFillRule(Qt.WindingFill)
         path_content.addRoundedRect(0, self.title_height,
@@ -118,15 +148,49 @@ class QDMGraphicsNode(QGraphicsItem):
         path_content.addRect(self.width - self.edge_size, self.title_height,
                              self.edge_size, self.edge_size)
 
+        path_outline = QPainterPath()
+        path_outline.addRoundedRect(0, 0, self.width, self.height,
+                                    self.edge_size, self.edge_size)
+        return path_title.simplified(), path_content.simplified(), path_outline.simplified()
+
+    def paint(self, painter, option, widget=None):
+        pen = self._pen_default if not self.isSelected() else self._pen_selected
+
+        if not isDetailed(painter):
+            painter.setPen(pen)
+            painter.setBrush(self._brush_background)
+            painter.drawRect(0, 0, self.width, self.height)
+            return
+
+        # title
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(self._brush_title)
+        painter.drawPath(self._path_title)
+
+        # content
         painter.setPen(Qt.NoPen)
         painter.setBrush(self._brush_background)
-        painter.drawPath(path_content.simplified())
+        painter.drawPath(self._path_content)
+
+        # the node is visible, create its real content soon
+        if self.grContent is None:
+            rect = self.getContentRect()
+            painter.drawPixmap(rect.topLeft(), self.scene().getContentPixmap(rect.width(), rect.height()))
+            self.scene().scheduleContent(self)
 
         # outline
-        path_outline = QPainterPath()
-        path_outline.addRoundedRect(0, 0, self.width, self.height,
-                                    self.edge_size, self.edge_size)
-        painter.setPen(
-            self._pen_default if not self.isSelected() else self._pen_selected)
+        painter.setPen(pen)
         painter.setBrush(Qt.NoBrush)
-        painter.drawPath(path_outline.simplified())
+        painter.drawPath(self._path_outline)
+
+
+class QDMGraphicsTitle(QGraphicsSimpleTextItem):
+    def paint(self, painter, option, widget=None):
+        if isDetailed(painter):
+            super().paint(painter, option, widget)
+
+
+class QDMGraphicsContent(QGraphicsProxyWidget):
+    def paint(self, painter, option, widget=None):
+        if isDetailed(painter):
+            super().paint(painter, option, widget)
@@ -1,8 +1,15 @@
-from PySide2.QtCore import QLine
-from PySide2.QtGui import QColor, QPen
+from PySide2.QtCore import QLineF, QTimer
+from PySide2.QtGui import QBrush, QColor, QPainter, QPen, QPixmap, QTransform
 from PySide2.QtWidgets import QGraphicsScene
 
 import math
+from contextlib import contextmanager
+
+# light grid lines closer than this on screen (in pixels) are not drawn
+GRID_FINE_MIN_SPACING = 6
+GRID_CACHE_SIZE = 16
+# content widgets created per event loop iteration for nodes scrolled into view
+CONTENT_BATCH_SIZE = 32
 
 
 class QDMGraphicsScene(QGraphicsScene):
@@ -23,6 +30,23 @@ class QDMGraphicsScene(QGraphicsScene):
         self._pen_dark = QPen(self._color_dark)
         self._pen_dark.setWidth(2)
 
+        # pre-rendered grid tiles, one brush per zoom level
+        self._grid_brushes = {}
+
+        # nodes waiting for their content widget and the picture shown meanwhile
+        self._pending_content = {}
+        self._content_pixmaps = {}
+
+        # selected nodes and the edges to update on the next event loop iteration
+        self._selected_nodes = []
+        self._dirty_edges = {}
+        self.selectionChanged.connect(self.onSelectionChanged)
+
+        # index method and view updates are restored when the outermost bulk update ends
+        self._bulk_depth = 0
+        self._bulk_index_method = None
+        self._views_suspended = 0
+
         self.scene_width, self.scence_height = 64000, 64000
 
         self.setGrScene(61000, 64000)
@@ -33,36 +57,147 @@ class QDMGraphicsScene(QGraphicsScene):
         self.setSceneRect(-width//2, -height//2,
                           width, height)
 
+    def invalidateGrid(self):
+        self._grid_brushes = {}
+        self.update()
+
+    def getGridBrush(self, scale):
+        show_light = self.gridSize * scale >= GRID_FINE_MIN_SPACING
+        key = (round(scale, 4), show_light)
+        brush = self._grid_brushes.get(key)
+        if brush is None:
+            if len(self._grid_brushes) >= GRID_CACHE_SIZE:
+                self._grid_brushes = {}
+            brush = self.createGridBrush(scale, show_light)
+            self._grid_brushes[key] = brush
+        return brush
+
+    def createGridBrush(self, scale, show_light):
+        ''' renders one dark grid square at the screen resolution of the given scale '''
+        tile_size = self.gridSize * self.gridSquares
+        pixel_size = max(1, int(math.ceil(tile_size * scale)))
+
+        pixmap = QPixmap(pixel_size, pixel_size)
+        pixmap.fill(self._color_background)
+
+        painter = QPainter(pixmap)
+        painter.scale(pixel_size / tile_size, pixel_size / tile_size)
+
+        if show_light:
+            lines_light = []
+            for i in range(self.gridSize, tile_size, self.gridSize):
+                lines_light.append(QLineF(i, 0, i, tile_size))
+                lines_light.append(QLineF(0, i, tile_size, i))
+            painter.setPen(self._pen_light)
+            painter.drawLines(lines_light)
+
+        # dark lines lie on the tile border, draw both halves of them
+        lines_dark = []
+        for i in (0, tile_size):
+            lines_dark.append(QLineF(i, 0, i, tile_size))
+            lines_dark.append(QLineF(0, i, tile_size, i))
+        painter.setPen(self._pen_dark)
+        painter.drawLines(lines_dark)
+        painter.end()
+
+        brush = QBrush(pixmap)
+        brush.setTransform(QTransform.fromScale(tile_size / pixel_size, tile_size / pixel_size))
+        return brush
+
+    @contextmanager
+    def viewUpdatesSuspended(self):
+        ''' the views are repainted once when the outermost block ends '''
+        if self._views_suspended == 0:
+            for view in self.views():
+                view.setUpdatesEnabled(False)
+        self._views_suspended += 1
+        try:
+            yield
+        finally:
+            self._views_suspended -= 1
+            if self._views_suspended == 0:
+                for view in self.views():
+                    view.setUpdatesEnabled(True)
+
+    @contextmanager
+    def bulkUpdate(self):
+        ''' adds or removes many items without updating the BSP index and the views for each of them '''
+        if self._bulk_depth == 0:
+            self._bulk_index_method = self.itemIndexMethod()
+            self.setItemIndexMethod(QGraphicsScene.NoIndex)
+        self._bulk_depth += 1
+        try:
+            with self.viewUpdatesSuspended():
+                yield
+        finally:
+            self._bulk_depth -= 1
+            if self._bulk_depth == 0:
+                # the index is rebuilt once for all items
+                self.setItemIndexMethod(self._bulk_index_method)
+
+    def clearItems(self):
+        ''' deletes all node and edge items at once, other items like the cut line stay in the scene '''
+        keep_items = [item for item in self.items()
+                      if item.parentItem() is None and not hasattr(item, 'node') and not hasattr(item, 'edge')]
+        for item in keep_items:
+            self.removeItem(item)
+
+        self.clear()
+        self._selected_nodes = []
+        self._dirty_edges = {}
+        self._pending_content = {}
+
+        for item in keep_items:
+            self.addItem(item)
+
+    def onSelectionChanged(self):
+        self._selected_nodes = [item.node for item in self.selectedItems() if hasattr(item, 'node')]
+
+    def getSelectedNodes(self):
+        return self._selected_nodes
+
+    def scheduleEdgesUpdate(self, node):
+        if not self._dirty_edges:
+            QTimer.singleShot(0, self.updateDirtyEdges)
+        for edge in node.getConnectedEdges():
+            self._dirty_edges[edge] = None
+
+    def updateDirtyEdges(self):
+        dirty_edges, self._dirty_edges = self._dirty_edges, {}
+        for edge in dirty_edges:
+            edge.updatePositions()
+
+    def getContentPixmap(self, width, height):
+        from xynodeeditor.node_content_widget import QDMNodeContentWidget
+
+        pixmap = self._content_pixmaps.get((width, height))
+        if pixmap is None:
+            widget = QDMNodeContentWidget(None)
+            widget.resize(width, height)
+            pixmap = widget.grab()
+            widget.deleteLater()
+            self._content_pixmaps[(width, height)] = pixmap
+        return pixmap
+
+    def scheduleContent(self, grNode):
+        if not self._pending_content:
+            QTimer.singleShot(0, self.createPendingContent)
+        self._pending_content[grNode] = None
+
+    def createPendingContent(self):
+        grNodes = list(self._pending_content)[:CONTENT_BATCH_SIZE]
+        for grNode in grNodes:
+            del self._pending_content[grNode]
+            # skip nodes which were removed meanwhile
+            if grNode.node.grNode is grNode:
+                grNode.node.initContent()
+
+        if self._pending_content:
+            QTimer.singleShot(0, self.createPendingContent)
+
     def drawBackground(self, painter, rect):
         super().drawBackground(painter, rect)
 
-        # here we create our grid
-        left = int(math.floor(rect.left()))
-        right = int(math.ceil(rect.right()))
-        top = int(math.floor(rect.top()))
-        bottom = int(math.ceil(rect.bottom()))
-
-        first_left = left - (left % self.gridSize)
-        first_top = top - (top % self.gridSize)
-
-        # compute all line to be drawn
-
-        lines_light, lines_dark = [], []
-        for x in range(first_left, right, self.gridSize):
-            if (x % (self.gridSize * self.gridSquares) != 0):
-                lines_light.append(QLine(x, top, x, bottom))
-            else:
-                lines_dark.append(QLine(x, top, x, bottom))
-
-        for y in range(first_top, bottom, self.gridSize):
-            if (y % (self.gridSize * self.gridSquares) != 0):
-                lines_light.append(QLine(left, y, right, y))
-            else:
-                lines_dark.append(QLine(left, y, right, y))
-
-        # draw the lines
-        painter.setPen(self._pen_light)
-        painter.drawLines(lines_light)
-
-        painter.setPen(self._pen_dark)
-        painter.drawLines(lines_dark)
+        # the grid brush is anchored at the scene origin like the grid lines
+        scale = painter.worldTransform().m11()
+        painter.fillRect(rect, self.getGridBrush(scale))
@@ -1,6 +1,24 @@
 from PySide2.QtCore import QRect
 from PySide2.QtGui import QBrush, QColor, QPainter, QPen
-from PySide2.QtWidgets import QGraphicsItem
+from PySide2.QtWidgets import QGraphicsItem, QStyleOptionGraphicsItem
+
+# sockets are too small to be seen below this level of detail
+SOCKET_LOD_MIN = 0.5
+
+SOCKET_COLORS = [
+    QColor("#FFFF7700"),
+    QColor("#FF52e220"),
+    QColor("#FF0056a6"),
+    QColor("#FFa86db1"),
+    QColor("#FFb54747"),
+    QColor("#FFdbe220")
+    ]
+SOCKET_OUTLINE_WIDTH = 1.0
+
+# all sockets of a type look the same, they share one pen and brush
+SOCKET_PEN = QPen(QColor("#FF000000"))
+SOCKET_PEN.setWidthF(SOCKET_OUTLINE_WIDTH)
+SOCKET_BRUSHES = [QBrush(color) for color in SOCKET_COLORS]
 
 
 class QDMGraphicsSocket(QGraphicsItem):
@@ -8,24 +26,14 @@ class QDMGraphicsSocket(QGraphicsItem):
         super().__init__(socket.node.grNode)
         self.socket = socket
         self.radius = 6.0
-        self.outline_width = 1.0
-        self._colors = [
-            QColor("#FFFF7700"),
-            QColor("#FF52e220"),
-            QColor("#FF0056a6"),
-            QColor("#FFa86db1"),
-            QColor("#FFb54747"),
-            QColor("#FFdbe220")
-            ]
-
-        self._color_bacground = self._colors[socket_type]
-        self._color_outline = QColor("#FF000000")
-
-        self._pen = QPen(self._color_outline)
-        self._pen.setWidthF(self.outline_width)
-        self._brush = QBrush(self._color_bacground)
+        self.outline_width = SOCKET_OUTLINE_WIDTH
+
+        self._pen = SOCKET_PEN
+        self._brush = SOCKET_BRUSHES[socket_type]
 
     def paint(self, painter: QPainter, option, widget=None):
+        if QStyleOptionGraphicsItem.levelOfDetailFromTransform(painter.worldTransform()) < SOCKET_LOD_MIN:
+            return
 
         # painting circle
         painter.setBrush(self._brush)
@@ -1,4 +1,4 @@
-from PySide2.QtCore import QEvent, Qt, Signal
+from PySide2.QtCore import QEvent, QRectF, Qt, Signal
 from PySide2.QtGui import QKeyEvent, QMouseEvent, QPainter
 from PySide2.QtWidgets import QApplication, QGraphicsView
 
@@ -12,6 +12,8 @@ MODE_EDGE_DRAG = 2
 MODE_EDGE_CUT = 3
 
 EDGE_DRAG_START_THRESHOLD = 10
+# cutline points closer than this many pixels are dropped
+CUTLINE_MIN_DISTANCE = 4
 
 DEBUG = False
 
@@ -44,10 +46,10 @@ class QDMGraphicsView(QGraphicsView):
         self.grScene.addItem(self.cutline)
 
     def initUI(self):
-        self.setRenderHints(QPainter.Antialiasing |
-                            QPainter.HighQualityAntialiasing |
-                            QPainter.TextAntialiasing |
-                            QPainter.SmoothPixmapTransform)
+        # set one by one, some PySide2 builds cannot combine the hints with |
+        for hint in (QPainter.Antialiasing, QPainter.HighQualityAntialiasing,
+                     QPainter.TextAntialiasing, QPainter.SmoothPixmapTransform):
+            self.setRenderHint(hint)
 
         self.setViewportUpdateMode(QGraphicsView.FullViewportUpdate)
 
@@ -159,7 +161,7 @@ class QDMGraphicsView(QGraphicsView):
             return
 
         if self.rubberBandDraggingRectangle:
-            self.grScene.scene.history.storeHistory("Selection changed")
+            self.grScene.scene.history.storeSelectionHistory("Selection changed")
             self.rubberBandDraggingRectangle = False
 
         super().mouseReleaseEvent(event)
@@ -195,7 +197,7 @@ class QDMGraphicsView(QGraphicsView):
             self.drag_edge.grEdge.update()
         if self.mode == MODE_EDGE_CUT:
             pos = self.mapToScene(event.pos())
-            self.cutline.line_points.append(pos)
+            self.cutline.addPoint(pos, CUTLINE_MIN_DISTANCE / self.transform().m11())
             self.cutline.update()
 
         self.last_scene_mouse_position = self.mapToScene(event.pos())
@@ -231,23 +233,34 @@ class QDMGraphicsView(QGraphicsView):
         super().keyPressEvent(event)
 
     def cutIntersectingEdges(self):
+        with self.grScene.scene.transaction("Delete cutted edges"):
+            self.removeIntersectingEdges()
 
+    def removeIntersectingEdges(self):
+        edges_to_remove = {}
         for ix in range(len(self.cutline.line_points) - 1):
             p1 = self.cutline.line_points[ix]
             p2 = self.cutline.line_points[ix + 1]
 
-            for edge in self.grScene.scene.edges:
-                if edge.grEdge.intersectsWith(p1, p2):
-                    edge.remove()
+            # only test edges whose bounding rect touches the segment, found by the scene index
+            segment_rect = QRectF(p1, p2).normalized().adjusted(-1, -1, 1, 1)
+            for item in self.grScene.items(segment_rect, Qt.IntersectsItemBoundingRect):
+                if hasattr(item, 'edge') and item.edge not in edges_to_remove and item.intersectsWith(p1, p2):
+                    edges_to_remove[item.edge] = None
+
+        self.grScene.scene.removeItems(edges=edges_to_remove)
         self.grScene.scene.history.storeHistory("Delete cutted edges", setModified=True)
 
     def deleteSelected(self):
-        for item in self.grScene.selectedItems():
-            if isinstance(item, QDMGraphicsEdge):
-                item.edge.remove()
-            elif hasattr(item, 'node'):
-                item.node.remove()
-        self.grScene.scene.history.storeHistory("Delete selected", setModified=True)
+        with self.grScene.scene.transaction("Delete selected"):
+            nodes, edges = [], []
+            for item in self.grScene.selectedItems():
+                if isinstance(item, QDMGraphicsEdge):
+                    edges.append(item.edge)
+                elif hasattr(item, 'node'):
+                    nodes.append(item.node)
+            self.grScene.scene.removeItems(nodes, edges)
+            self.grScene.scene.history.storeHistory("Delete selected", setModified=True)
 
     def debug_modifiers(self, event):
         out = "MODS: "
@@ -292,26 +305,33 @@ class QDMGraphicsView(QGraphicsView):
                         print("View::edgeDragEnd   ~  already have a same edge")
                     return True
 
-            if not self.drag_edge.start_socket.is_multi_edges:
-                self.drag_edge.start_socket.removeAllEdges()
+            # a node must not depend on itself
+            if self.grScene.scene.graph.wouldCreateCycle(self.drag_start_socket, item.socket):
                 if DEBUG:
-                    print("View::edgeDragEnd   ~   remove edges from start socket:", self.drag_edge.start_socket)
-            if not item.socket.is_multi_edges:
-                item.socket.removeAllEdges()
+                    print("View::edgeDragEnd   ~  the edge would create a cycle")
+                return True
+
+            with self.grScene.scene.transaction("Created new edge by dargging"):
+                if not self.drag_edge.start_socket.is_multi_edges:
+                    self.drag_edge.start_socket.removeAllEdges()
+                    if DEBUG:
+                        print("View::edgeDragEnd   ~   remove edges from start socket:", self.drag_edge.start_socket)
+                if not item.socket.is_multi_edges:
+                    item.socket.removeAllEdges()
+                    if DEBUG:
+                        print("View::edgeDragEnd   ~   remove edges from end socket:", item.socket)
+                # self.drag_edge.end_socket = item.socket
+                # self.drag_edge.end_socket.addEdge(self.drag_edge)
+                # self.drag_edge.start_socket = self.drag_start_socket
+                # self.drag_edge.start_socket.addEdge(self.drag_edg)
+                self.drag_edge.remove()
+                new_edge = Edge(self.grScene.scene, self.drag_start_socket, item.socket, EDGE_TYPE_BEZIER)
+                # self.drag_edge.updatePositions()
+                self.mode = MODE_NOOP
                 if DEBUG:
-                    print("View::edgeDragEnd   ~   remove edges from end socket:", item.socket)
-            # self.drag_edge.end_socket = item.socket
-            # self.drag_edge.end_socket.addEdge(self.drag_edge)
-            # self.drag_edge.start_socket = self.drag_start_socket
-            # self.drag_edge.start_socket.addEdge(self.drag_edg)
-            self.drag_edge.remove()
-            new_edge = Edge(self.grScene.scene, self.drag_start_socket, item.socket, EDGE_TYPE_BEZIER)
-            # self.drag_edge.updatePositions()
-            self.mode = MODE_NOOP
-            if DEBUG:
-                print("View::edgeDragEnd   ~   created new edge:", new_edge, "connecting", new_edge.start_socket, "<-->", new_edge.end_socket)
-                print("View::edgeDragEnd   ~ End dargging edge")
-            self.grScene.scene.history.storeHistory("Created new edge by dargging", setModified=True)
+                    print("View::edgeDragEnd   ~   created new edge:", new_edge, "connecting", new_edge.start_socket, "<-->", new_edge.end_socket)
+                    print("View::edgeDragEnd   ~ End dargging edge")
+                self.grScene.scene.history.storeHistory("Created new edge by dargging", setModified=True)
         else:
             self.mode = MODE_NOOP
             if DEBUG:
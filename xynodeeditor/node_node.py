@@ -1,8 +1,6 @@
 from collections import OrderedDict
 from xynodeeditor.node_serializable import Serializable
 from xynodeeditor.node_socket import LEFT_BOTTOM, LEFT_TOP, RIGHT_BOTTOM, RIGHT_TOP, Socket
-from xynodeeditor.node_content_widget import QDMNodeContentWidget
-from xynodeeditor.node_graphics_node import QDMGraphicsNode
 
 DEBUG = False
 
@@ -13,21 +11,36 @@ class Node(Serializable):
         self._title = title
         self.scene = scene
 
-        self.content = QDMNodeContentWidget(self)
-        self.grNode = QDMGraphicsNode(self)
-#        self.title = title
+        self._serialized = None
 
-        self.scene.addNode(self)
-        self.scene.grScene.addItem(self.grNode)
+        # position and content data of a node without graphics
+        self._pos = (0, 0)
+        self._content_data = OrderedDict()
 
+        self.content = None
+        self.grNode = None
         self.socket_spacing = 22
-        # create sockets for inputs and outputs
         self.inputs = []
         self.outputs = []
 
+        # result of evalImplementation(), recomputed by eval() when the node is dirty
+        self.value = None
+        self._is_dirty = True
+        self._is_invalid = False
+
+        if self.scene.isUIDeferred():
+            self.scene.deferNodeUI(self)
+        elif self.scene.grScene is not None:
+            self.initUI()
+
+        self.scene.addNode(self)
+
+        # create sockets for inputs and outputs
+
         counter = 0
         for item in inputs:
-            socket = Socket(node=self, index=counter, position=LEFT_BOTTOM, socket_type=item, multi_edges=False)
+            socket = Socket(node=self, index=counter, position=LEFT_BOTTOM, socket_type=item, multi_edges=False,
+                            is_input=True)
             counter += 1
             self.inputs.append(socket)
 
@@ -39,12 +52,45 @@ class Node(Serializable):
     def __str__(self):
         return "<Node %s..%s>" % (hex(id(self))[2:5], hex(id(self))[-3:])
 
+    def initUI(self):
+        ''' creates the graphics of the node and its sockets, content is created by initContent() '''
+        from xynodeeditor.node_graphics_node import QDMGraphicsNode
+
+        self.grNode = QDMGraphicsNode(self)
+        self.grNode.setPos(*self._pos)
+        # sockets are placed before the node is in the scene, moving them there is slow
+        for socket in (self.inputs + self.outputs):
+            socket.initUI()
+
+        self.scene.grScene.addItem(self.grNode)
+
+    def initContent(self):
+        ''' creates the content widget, the node shows a static picture of it until then '''
+        from xynodeeditor.node_content_widget import QDMNodeContentWidget
+
+        if self.content is not None or self.grNode is None:
+            return
+        self.content = QDMNodeContentWidget(self)
+        self.content.deserialize(self._content_data)
+        self.grNode.initContent()
+
     @property
     def pos(self):
-        return self.grNode.pos()   # QPointF
+        from PySide2.QtCore import QPointF
+
+        return QPointF(*self.getPos())
+
+    def getPos(self):
+        if self.grNode is not None:
+            pos = self.grNode.pos()
+            return pos.x(), pos.y()
+        return self._pos
 
     def setPos(self, x, y):
-        self.grNode.setPos(x, y)
+        self.scene.history.recordMoved(self)
+        self._pos = (x, y)
+        if self.grNode is not None:
+            self.grNode.setPos(x, y)
 
     @property
     def title(self):
@@ -53,7 +99,9 @@ class Node(Serializable):
     @title.setter
     def title(self, value):
         self._title = value
-        self.grNode.title = self._title
+        self.invalidateSerialized()
+        if self.grNode is not None:
+            self.grNode.title = self._title
 
     def getSocketPosition(self, index, position):
         x = 0 if position in [LEFT_TOP, LEFT_BOTTOM] else self.grNode.width
@@ -65,11 +113,123 @@ class Node(Serializable):
 
         return [x, y]
 
+    def getConnectedEdges(self):
+        for socket in self.inputs:
+            yield from socket.edges
+        for socket in self.outputs:
+            yield from socket.edges
+
+    def isAttached(self):
+        return self.scene.getNodeById(self.id) is self
+
+    def getInput(self, index=0):
+        ''' returns the node connected to input index, None if there is none '''
+        inputs = self.getInputs(index)
+        return inputs[0] if inputs else None
+
+    def getInputs(self, index=0):
+        return self.getSocketNodes(self.inputs[index])
+
+    def getOutputs(self, index=0):
+        return self.getSocketNodes(self.outputs[index])
+
+    def getSocketNodes(self, socket):
+        ''' nodes on the other end of the edges of socket '''
+        nodes = []
+        for edge in socket.edges:
+            other_socket = edge.getOtherSocket(socket)
+            if other_socket is not None:
+                nodes.append(other_socket.node)
+        return nodes
+
+    def getParentNodes(self):
+        return self.scene.graph.getParentNodes(self)
+
+    def getChildrenNodes(self):
+        return self.scene.graph.getChildrenNodes(self)
+
+    def isDirty(self):
+        return self._is_dirty
+
+    def markDirty(self, new_value=True):
+        ''' marks only this node, use markDescendantsDirty() for the nodes depending on it '''
+        self._is_dirty = new_value
+        if new_value:
+            self.onMarkedDirty()
+
+    def onMarkedDirty(self):
+        pass
+
+    def markDescendantsDirty(self, new_value=True):
+        # nodes which are dirty already were walked when they became dirty
+        stack = [self]
+        while stack:
+            for node in stack.pop().getChildrenNodes():
+                if node.isDirty() != new_value:
+                    node.markDirty(new_value)
+                    stack.append(node)
+
+    def isInvalid(self):
+        return self._is_invalid
+
+    def markInvalid(self, new_value=True):
+        self._is_invalid = new_value
+
+    def onInputChanged(self, socket=None):
+        ''' called when an input is connected or disconnected, or when its value changed otherwise '''
+        self.markDirty()
+        self.markDescendantsDirty()
+
+    def evalImplementation(self):
+        ''' computes the value of the node from the values of getInput(), reimplement in subclasses '''
+        return None
+
+    def eval(self):
+        ''' returns the value of the node, the dirty nodes it depends on are evaluated first, in topological order '''
+        if not self.isDirty():
+            return self.value
+        for node in self.getDirtyAncestors():
+            node.evalDirty()
+        return self.value
+
+    def getDirtyAncestors(self):
+        ''' this node and the dirty nodes it depends on, every node after its inputs '''
+        # depth first search with an explicit stack, long chains do not hit the recursion limit
+        order = []
+        visited = {self}
+        stack = [(self, iter(self.getParentNodes()))]
+        while stack:
+            node, parents = stack[-1]
+            for parent in parents:
+                if parent not in visited and parent.isDirty():
+                    visited.add(parent)
+                    stack.append((parent, iter(parent.getParentNodes())))
+                    break
+            else:
+                stack.pop()
+                order.append(node)
+        return order
+
+    def evalDirty(self):
+        # an input which failed fails all the nodes depending on it, they stay dirty to be retried
+        if any(node.isInvalid() for node in self.getParentNodes()):
+            self.markInvalid()
+            self.value = None
+            return
+
+        try:
+            self.value = self.evalImplementation()
+        except Exception as e:
+            print("!W:", "Node::eval", self, "failed:", e)
+            self.markInvalid()
+            self.value = None
+            return
+        self.markInvalid(False)
+        self.markDirty(False)
+
     def updateConnectedEdges(self):
-        for socket in self.inputs + self.outputs:
-            if socket.edges:
-                for edge in socket.edges:
-                    edge.updatePositions()
+        for edge in self.getConnectedEdges():
+            edge.updatePositions()
 
     def remove(self):
         if DEBUG:
@@ -77,62 +237,108 @@ class Node(Serializable):
         if DEBUG:
             print(" - remove all edge from sockets")
         for socket in (self.inputs + self.outputs):
-            if socket.edges:
+            if socket.hasEdges():
                 if DEBUG:
                     print("  - removing from socket:", socket)
-                for edge in socket.edges:
-                    if DEBUG:
-                        print("  -- edge:", edge)
-                    edge.remove()
-        if DEBUG:
-            print(" - remove grNode")
-        self.scene.grScene.removeItem(self.grNode)
-        self.grNode = None
+                socket.removeAllEdges()
+        for socket in (self.inputs + self.outputs):
+            self.scene.removeSocket(socket)
         if DEBUG:
             print(" - remove node from the scene")
         self.scene.removeNode(self)
+        if DEBUG:
+            print(" - remove grNode")
+        if self.grNode is not None:
+            self.scene.grScene.removeItem(self.grNode)
+            self.grNode = None
         if DEBUG:
             print(" - everything was done")
 
+    def invalidateSerialized(self):
+        self._serialized = None
+
     def serialize(self):
+        # nodes are moved by Qt without telling us, compare the position instead
+        pos_x, pos_y = self.getPos()
+        content = self.content.serialize() if self.content is not None else self._content_data
+        data = self._serialized
+        if data is not None and data['pos_x'] == pos_x and data['pos_y'] == pos_y and \
+                (data['content'] is content or data['content'] == content):
+            return data
+
         inputs, outputs = [], []
         for socket in self.inputs:
             inputs.append(socket.serialize())
         for socket in self.outputs:
             outputs.append(socket.serialize())
-        return OrderedDict([
+        self._serialized = OrderedDict([
             ('id', self.id),
             ('title', self.title),
-            ('pos_x', self.grNode.scenePos().x()),
-            ('pos_y', self.grNode.scenePos().y()),
+            ('pos_x', pos_x),
+            ('pos_y', pos_y),
             ('inputs', inputs),
             ('outputs', outputs),
-            ('content', self.content.serialize()),
+            ('content', content),
         ])
+        return self._serialized
+
+    def hasSameSockets(self, data):
+        return [socket.id for socket in self.inputs] == [socket_data['id'] for socket_data in data['inputs']] and \
+            [socket.id for socket in self.outputs] == [socket_data['id'] for socket_data in data['outputs']]
+
+    def patch(self, data):
+        ''' updates title, content and position from data, returns True if the node was moved '''
+        if self.title != data['title']:
+            self.title = data['title']
+
+        if 'content' in data:
+            content = self.content.serialize() if self.content is not None else self._content_data
+            if content != data['content']:
+                self._content_data = data['content']
+                if self.content is not None:
+                    self.content.deserialize(self._content_data)
+
+        for socket, socket_data in zip(self.inputs + self.outputs, data['inputs'] + data['outputs']):
+            socket.is_multi_edges = socket.determineMultiEdges(socket_data)
+
+        if self.getPos() != (data['pos_x'], data['pos_y']):
+            self.setPos(data['pos_x'], data['pos_y'])
+            return True
+        return False
 
     def deserialize(self, data, hashmap={}, restore_id=True):
         if restore_id:
-            self.id = data["id"]
+            self.scene.reindexNode(self, data["id"])
         hashmap[data['id']] = self
 
         self.setPos(data['pos_x'], data['pos_y'])
 
         self.title = data["title"]
-        # TODO what's the lambda thing?
-        data['inputs'].sort(key=lambda socket: socket['index'] + socket['position'] * 10000)
-        data['outputs'].sort(key=lambda socket: socket['index'] + socket['position'] * 10000)
+
+        if 'content' in data:
+            self._content_data = data['content']
+            if self.content is not None:
+                self.content.deserialize(self._content_data)
+        # data may be the cached record of another node, sort copies of the socket lists
+        inputs_data = sorted(data['inputs'], key=lambda socket: socket['index'] + socket['position'] * 10000)
+        outputs_data = sorted(data['outputs'], key=lambda socket: socket['index'] + socket['position'] * 10000)
+
+        for socket in (self.inputs + self.outputs):
+            self.scene.removeSocket(socket)
+        self.invalidateSerialized()
 
         self.inputs = []
-        for socket_data in data['inputs']:
+        for socket_data in inputs_data:
             new_socket = Socket(node=self,
                                 index=socket_data['index'],
                                 position=socket_data['position'],
-                                socket_type=socket_data['socket_type'])
+                                socket_type=socket_data['socket_type'],
+                                is_input=True)
             new_socket.deserialize(socket_data, hashmap, restore_id)
             self.inputs.append(new_socket)
 
         self.outputs = []
-        for socket_data in data['outputs']:
+        for socket_data in outputs_data:
             new_socket = Socket(node=self,
                                 index=socket_data['index'],
                                 position=socket_data['position'],
@@ -1,25 +1,44 @@
-import json
+import io
 from collections import OrderedDict
+from contextlib import contextmanager
 from xynodeeditor.node_scene_clipboard import SceneClipboard
+from xynodeeditor.node_scene_graph import SceneGraph
+from xynodeeditor.node_scene_stream import FILE_FORMAT_JSON, SceneStreamReader, iterSceneData, writeSceneFile
+from xynodeeditor.node_scene_binary import isBinarySceneFile, iterBinaryScene
 from xynodeeditor.node_serializable import Serializable
-from xynodeeditor.node_graphics_scene import QDMGraphicsScene
 from xynodeeditor.node_node import Node
-from xynodeeditor.node_edge import Edge
+from xynodeeditor.node_edge import EDGE_TYPE_BEZIER, Edge
 from xynodeeditor.node_scene_history import SceneHistory
 
 
 class Scene(Serializable):
-    def __init__(self):
+    def __init__(self, headless=False):
         super().__init__()
-        self.nodes = []
-        self.edges = []
+        # registries keyed by object id, kept in insertion order
+        self._nodes = {}
+        self._edges = {}
+        self._sockets = {}
+        # which nodes are connected, for upstream and downstream queries
+        self.graph = SceneGraph(self)
         self.scene_width = 64000
         self.scence_height = 64000
 
         self._has_been_modified = False
         self._has_benn_modified_listeners = []
 
-        self.initUI()
+        # listeners are called once when the outermost transaction ends
+        self._transaction_depth = 0
+        self._modified_notify_pending = False
+
+        # nodes and edges created inside deferUI() get their graphics when it ends
+        self._ui_deferred = 0
+        self._deferred_nodes = []
+        self._deferred_edges = []
+
+        # headless scenes have no graphics until initUI() is called
+        self.grScene = None
+        if not headless:
+            self.initUI()
         self.history = SceneHistory(self)
         self.clipboard = SceneClipboard(self)
 
@@ -32,88 +51,345 @@ class Scene(Serializable):
         if not self._has_been_modified and value:
             self._has_been_modified = value
 
-            # call all registered listeners
-            for callback in self._has_benn_modified_listeners:
-                callback()
+            if self._transaction_depth:
+                self._modified_notify_pending = True
+            else:
+                self.callHasBeenModifiedListeners()
         self._has_been_modified = value
 
     def addHasBeenModifiedListener(self, callback):
         self._has_benn_modified_listeners.append(callback)
 
+    def callHasBeenModifiedListeners(self):
+        # call all registered listeners
+        for callback in self._has_benn_modified_listeners:
+            callback()
+
+    def isInTransaction(self):
+        return self._transaction_depth > 0
+
+    @contextmanager
+    def transaction(self, desc):
+        ''' edits inside are stored as one history stamp, listeners and views are updated once at the end '''
+        self._transaction_depth += 1
+        self.history.beginTransaction(desc)
+        try:
+            if self.grScene is None:
+                yield
+            else:
+                with self.grScene.viewUpdatesSuspended():
+                    yield
+        finally:
+            self.history.endTransaction()
+            self._transaction_depth -= 1
+            if self._transaction_depth == 0 and self._modified_notify_pending:
+                self._modified_notify_pending = False
+                if self._has_been_modified:
+                    self.callHasBeenModifiedListeners()
+
     def initUI(self):
+        from xynodeeditor.node_graphics_scene import QDMGraphicsScene
+
         self.grScene = QDMGraphicsScene(self)
         self.grScene.setGrScene(self.scene_width, self.scence_height)
 
+        # attach graphics to nodes and edges created while headless
+        for node in self.nodes:
+            node.initUI()
+        for edge in self.edges:
+            edge.initUI()
+
+    def isHeadless(self):
+        return self.grScene is None
+
+    def isUIDeferred(self):
+        return self._ui_deferred > 0
+
+    @contextmanager
+    def deferUI(self):
+        ''' creates the graphics of nodes and edges added inside in one pass at the end '''
+        self._ui_deferred += 1
+        try:
+            yield
+        finally:
+            self._ui_deferred -= 1
+            if self._ui_deferred == 0:
+                self.initDeferredUI()
+
+    def deferNodeUI(self, node):
+        self._deferred_nodes.append(node)
+
+    def deferEdgeUI(self, edge):
+        self._deferred_edges.append(edge)
+
+    def initDeferredUI(self):
+        nodes, self._deferred_nodes = self._deferred_nodes, []
+        edges, self._deferred_edges = self._deferred_edges, []
+        if self.grScene is None:
+            return
+
+        with self.grScene.bulkUpdate():
+            # skip items removed before the batch ended
+            for node in nodes:
+                if node.grNode is None and self._nodes.get(node.id) is node:
+                    node.initUI()
+            for edge in edges:
+                if edge.grEdge is None and self._edges.get(edge.id) is edge:
+                    edge.initUI()
+
+    def addNodesFrom(self, nodes_data):
+        ''' creates a node for each dict of title, inputs, outputs and pos, returns the new nodes '''
+        nodes = []
+        with self.deferUI():
+            for node_data in nodes_data:
+                node = Node(self, node_data.get('title', "Undefined Node"),
+                            inputs=node_data.get('inputs', []), outputs=node_data.get('outputs', []))
+                if 'pos' in node_data:
+                    node.setPos(*node_data['pos'])
+                nodes.append(node)
+        return nodes
+
+    def addEdgesFrom(self, sockets_pairs, edge_type=EDGE_TYPE_BEZIER):
+        ''' connects each (start_socket, end_socket) pair, returns the new edges '''
+        with self.deferUI():
+            edges = [Edge(self, start_socket, end_socket, edge_type) for start_socket, end_socket in sockets_pairs]
+        return edges
+
+    def getSelectedItems(self):
+        if self.grScene is None:
+            return []
+        return self.grScene.selectedItems()
+
+    @property
+    def nodes(self):
+        return list(self._nodes.values())
+
+    @property
+    def edges(self):
+        return list(self._edges.values())
+
+    @property
+    def sockets(self):
+        return list(self._sockets.values())
+
+    def getNodeById(self, node_id):
+        return self._nodes.get(node_id)
+
+    def getEdgeById(self, edge_id):
+        return self._edges.get(edge_id)
+
+    def getSocketById(self, socket_id):
+        return self._sockets.get(socket_id)
+
     def addNode(self, node):
-        self.nodes.append(node)
+        self._register(self._nodes, node)
+        self.graph.addNode(node)
+        self.history.recordAdded(node)
 
     def addEdge(self, edge):
-        self.edges.append(edge)
+        self._register(self._edges, edge)
+        self.history.recordAdded(edge)
+
+    def addSocket(self, socket):
+        self._register(self._sockets, socket)
+
+    def _register(self, registry, item):
+        # a live item is never replaced, the new one gets another id
+        if registry.get(item.id, item) is not item:
+            print("!W:", "Scene: id", item.id, "of", item, "is used already")
+            item.id = Serializable.newId()
+        registry[item.id] = item
 
     def removeNode(self, node):
-        if node in self.nodes:
-            self.nodes.remove(node)
+        if self._nodes.get(node.id) is node:
+            self.history.recordRemoved(node)
+            del self._nodes[node.id]
+            self.graph.removeNode(node)
         else:
             print("!W:", "Scene::removeNode", node, "is not in the list")
 
     def removeEdge(self, edge):
         # 防止重复删除
-        if edge in self.edges:
-            self.edges.remove(edge)
+        if self._edges.get(edge.id) is edge:
+            self.history.recordRemoved(edge)
+            del self._edges[edge.id]
         else:
             print("!W:", "Scene::removeEdge", edge, "is not in the list")
 
+    def removeItems(self, nodes=(), edges=()):
+        ''' removes many nodes and edges, edges first so nodes find their sockets empty '''
+        edges = dict.fromkeys(edges)
+        for node in nodes:
+            for edge in node.getConnectedEdges():
+                edges[edge] = None
+        nodes = [node for node in dict.fromkeys(nodes) if node.isAttached()]
+
+        # rebuilding the index once is cheaper than updating it for most of the scene
+        if self.grScene is not None and len(nodes) * 2 > len(self._nodes):
+            with self.grScene.bulkUpdate():
+                self._removeItems(nodes, edges)
+        else:
+            self._removeItems(nodes, edges)
+
+    def _removeItems(self, nodes, edges):
+        for edge in edges:
+            edge.remove()
+        for node in nodes:
+            node.remove()
+
+    def removeSocket(self, socket):
+        if self._sockets.get(socket.id) is socket:
+            del self._sockets[socket.id]
+
+    def _reindex(self, registry, item, new_id):
+        if registry.get(item.id) is item:
+            del registry[item.id]
+        Serializable.reserveId(new_id)
+        item.id = new_id
+        item.invalidateSerialized()
+        self._register(registry, item)
+
+    def reindexNode(self, node, new_id):
+        self._reindex(self._nodes, node, new_id)
+
+    def reindexEdge(self, edge, new_id):
+        self._reindex(self._edges, edge, new_id)
+
+    def reindexSocket(self, socket, new_id):
+        self._reindex(self._sockets, socket, new_id)
+
     def clear(self):
-        while len(self.nodes) > 0:
-            self.nodes[0].remove()
+        ''' drops all nodes and edges at once '''
+        # recorded like removing them one by one, positions and contents are read from the graphics
+        for edge in self._edges.values():
+            self.history.recordRemoved(edge)
+        for node in self._nodes.values():
+            self.history.recordRemoved(node)
+
+        if self.grScene is not None:
+            self.grScene.clearItems()
+            # the graphics items are deleted already
+            for node in self._nodes.values():
+                node.grNode = None
+            for edge in self._edges.values():
+                edge.grEdge = None
+            for socket in self._sockets.values():
+                socket.grSocket = None
+
+        self._nodes = {}
+        self._edges = {}
+        self._sockets = {}
+        self.graph.clear()
+        self._deferred_nodes = []
+        self._deferred_edges = []
 
         self.has_been_modified = False
 
-    def saveToFile(self, filename):
-        with open(filename, "w") as file:
-            file.write(json.dumps(self.serialize(), indent=4))
-            print("saving to", filename, "was successfull.")
+    def saveToFile(self, filename, file_format=FILE_FORMAT_JSON):
+        # nodes and edges are serialized while they are written
+        writeSceneFile(self.serializeIter(), filename, file_format)
+        print("saving to", filename, "was successfull.")
 
-            self.has_been_modified = False
+        self.has_been_modified = False
 
     def loadFromFile(self, filename):
-        with open(filename, "r") as file:
-            raw_data = file.read()
-            data = json.loads(raw_data, encoding='utf-8')
+        # the file is read while the scene is built, a broken file is found only halfway through
+        data = self.serialize()
+        has_been_modified = self.has_been_modified
+        had_changes = self.history.hasChanges()
+        try:
+            with open(filename, "rb") as file:
+                if isBinarySceneFile(file):
+                    self.deserializeStream(iterBinaryScene(file))
+                else:
+                    self.deserializeStream(SceneStreamReader(io.TextIOWrapper(file, encoding='utf-8')))
+        except Exception:
             self.deserialize(data)
+            self.has_been_modified = has_been_modified
+            # the restored items are the ones the history knows already
+            if not had_changes:
+                self.history.clearChanges()
+            raise
 
-            self.has_been_modified = False
-            self.history.storeHistory("load from file")
+        self.has_been_modified = False
+        # stamps of the previous scene refer to nodes which are gone
+        self.history.clear()
+        self.history.storeHistory("load from file")
 
     def serialize(self):
-        nodes, edges = [], []
-        for node in self.nodes:
-            nodes.append(node.serialize())
-        for edge in self.edges:
-            edges.append(edge.serialize())
+        data = self.serializeIter()
+        data['nodes'] = list(data['nodes'])
+        data['edges'] = list(data['edges'])
+        return data
+
+    def serializeIter(self):
+        ''' like serialize(), but nodes and edges are generators '''
         return OrderedDict([
             ('id', self.id),
             ('scene_width', self.scene_width),
             ('scene_height', self.scence_height),
-            ('nodes', nodes),
-            ('edges', edges),
+            ('nodes', (node.serialize() for node in self.nodes)),
+            ('edges', (edge.serialize() for edge in self.edges)),
         ])
 
     def deserialize(self, data, hashmap={}, restore_id=True):
+        self.deserializeStream(iterSceneData(data), restore_id)
+
+    def deserializeStream(self, items, restore_id=True):
+        ''' creates the scene from (key, value) pairs, one pair for each node and edge '''
         self.clear()
+        # ordering all nodes once is cheaper than keeping the order while edges come in any order
+        self.graph.invalidateOrder()
         hashmap = {}
+        pending_edges = []
+
+        with self.deferUI():
+            for key, value in items:
+                if key == 'id':
+                    if restore_id:
+                        self.id = value
+                elif key == 'nodes':
+                    Node(self).deserialize(value, hashmap, restore_id)
+                elif key == 'edges':
+                    if value['start'] in hashmap and value['end'] in hashmap:
+                        Edge(self).deserialize(value, hashmap, restore_id)
+                    else:
+                        # edge stored before its nodes
+                        pending_edges.append(value)
 
-        if restore_id:
-            self.id = data['id']
+            for edge_data in pending_edges:
+                Edge(self).deserialize(edge_data, hashmap, restore_id)
 
-        # create nodes
+    def patch(self, data):
+        ''' brings the scene to the state in data, keeping nodes and edges which did not change '''
+        nodes_data = {node_data['id']: node_data for node_data in data['nodes']}
+        edges_data = {edge_data['id']: edge_data for edge_data in data['edges']}
+        self.id = data['id']
+
+        # remove edges which are gone or re-wired and nodes which are gone or got different sockets
+        self.removeItems(
+            [node for node in self.nodes
+             if node.id not in nodes_data or not node.hasSameSockets(nodes_data[node.id])],
+            [edge for edge in self.edges
+             if edge.id not in edges_data or not edge.isSameAs(edges_data[edge.id])])
+
+        # create missing nodes, move and rename the others
+        hashmap = {}
+        moved_nodes = []
         for node_data in data['nodes']:
-            Node(self).deserialize(node_data, hashmap, restore_id)
-        # TODO: 为什么hashmap 的值传出来了？？
-        # print(hashmap)
+            node = self.getNodeById(node_data['id'])
+            if node is None:
+                Node(self).deserialize(node_data, hashmap, restore_id=True)
+            elif node.patch(node_data):
+                moved_nodes.append(node)
 
-        # create edges
+        # create missing edges
         for edge_data in data['edges']:
-            Edge(self).deserialize(edge_data, hashmap, restore_id)
+            if self.getEdgeById(edge_data['id']) is None:
+                for socket_id in (edge_data['start'], edge_data['end']):
+                    if socket_id not in hashmap:
+                        hashmap[socket_id] = self.getSocketById(socket_id)
+                Edge(self).deserialize(edge_data, hashmap, restore_id=True)
 
-        return
+        for node in moved_nodes:
+            node.updateConnectedEdges()
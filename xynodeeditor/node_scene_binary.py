@@ -0,0 +1,162 @@
+import json
+import struct
+import sys
+from array import array
+from collections import OrderedDict
+
+
+BINARY_MAGIC = b'XYNB'
+BINARY_VERSION = 1
+
+# magic, version, scene id, scene width, scene height
+HEADER = struct.Struct('<4sHqqq')
+COUNT = struct.Struct('<I')
+
+
+def isBinarySceneFile(file):
+    ''' checks the magic number and rewinds the file '''
+    magic = file.read(len(BINARY_MAGIC))
+    file.seek(-len(magic), 1)
+    return magic == BINARY_MAGIC
+
+
+def writeArray(file, typecode, values):
+    values = array(typecode, values)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    file.write(COUNT.pack(len(values)))
+    file.write(values.tobytes())
+
+
+def readArray(file, typecode):
+    count, = COUNT.unpack(file.read(COUNT.size))
+    values = array(typecode)
+    values.frombytes(file.read(count * values.itemsize))
+    if len(values) != count:
+        raise ValueError("Binary scene file is truncated")
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+
+class StringTable():
+    def __init__(self):
+        self.strings = []
+        self.indexes = {}
+
+    def add(self, value):
+        index = self.indexes.get(value)
+        if index is None:
+            index = self.indexes[value] = len(self.strings)
+            self.strings.append(value)
+        return index
+
+    def write(self, file):
+        encoded = [value.encode('utf-8') for value in self.strings]
+        writeArray(file, 'I', [len(value) for value in encoded])
+        file.write(b''.join(encoded))
+
+    @staticmethod
+    def read(file):
+        strings = []
+        for length in readArray(file, 'I'):
+            strings.append(file.read(length).decode('utf-8'))
+        return strings
+
+
+def dumpSceneBinary(data, file):
+    ''' writes serialized scene data as column tables of nodes, sockets and edges '''
+    strings = StringTable()
+    node_columns = [array('q'), array('I'), array('d'), array('d'), array('I'), array('I'), array('I')]
+    socket_columns = [array('q'), array('i'), array('B'), array('i'), array('B')]
+    socket_indexes = {}
+
+    for node_data in data['nodes']:
+        for column, value in zip(node_columns, (
+                node_data['id'], strings.add(node_data['title']), node_data['pos_x'], node_data['pos_y'],
+                len(node_data['inputs']), len(node_data['outputs']), strings.add(json.dumps(node_data['content'])))):
+            column.append(value)
+
+        for socket_data in node_data['inputs'] + node_data['outputs']:
+            socket_indexes[socket_data['id']] = len(socket_indexes)
+            for column, value in zip(socket_columns, (
+                    socket_data['id'], socket_data['index'], socket_data['position'],
+                    socket_data['socket_type'], socket_data.get('multi_edges', 255))):
+                column.append(value)
+
+    edge_columns = [array('q'), array('i'), array('I'), array('I')]
+    for edge_data in data['edges']:
+        for column, value in zip(edge_columns, (
+                edge_data['id'], edge_data['edge_type'],
+                socket_indexes[edge_data['start']], socket_indexes[edge_data['end']])):
+            column.append(value)
+
+    file.write(HEADER.pack(BINARY_MAGIC, BINARY_VERSION, data['id'], data['scene_width'], data['scene_height']))
+    strings.write(file)
+    for column in node_columns + socket_columns + edge_columns:
+        writeArray(file, column.typecode, column)
+
+
+def iterBinaryScene(file):
+    ''' yields (key, value) of a binary scene file like SceneStreamReader does for json '''
+    magic, version, scene_id, scene_width, scene_height = HEADER.unpack(file.read(HEADER.size))
+    if magic != BINARY_MAGIC or version > BINARY_VERSION:
+        raise ValueError("Unsupported binary scene file version %d" % version)
+
+    yield 'id', scene_id
+    yield 'scene_width', scene_width
+    yield 'scene_height', scene_height
+
+    strings = StringTable.read(file)
+    # plain lists are faster to index than arrays
+    node_ids, titles, pos_xs, pos_ys, input_counts, output_counts, contents = \
+        [readArray(file, typecode).tolist() for typecode in 'qIddIII']
+    socket_ids, socket_indexes, positions, socket_types, multi_edges = \
+        [readArray(file, typecode).tolist() for typecode in 'qiBiB']
+    edge_ids, edge_types, starts, ends = [readArray(file, typecode).tolist() for typecode in 'qiII']
+
+    # most nodes share the same content, parse every distinct one only once
+    parsed_contents = {}
+
+    def contentData(string_ix):
+        content = parsed_contents.get(string_ix)
+        if content is None:
+            content = parsed_contents[string_ix] = json.loads(strings[string_ix], object_pairs_hook=OrderedDict)
+        return OrderedDict(content)
+
+    def socketData(ix):
+        socket_data = {
+            'id': socket_ids[ix],
+            'index': socket_indexes[ix],
+            'multi_edges': bool(multi_edges[ix]),
+            'position': positions[ix],
+            'socket_type': socket_types[ix],
+        }
+        # sockets from old files without multi_edges
+        if multi_edges[ix] == 255:
+            del socket_data['multi_edges']
+        return socket_data
+
+    first_socket = 0
+    for ix, node_id in enumerate(node_ids):
+        sockets_count = input_counts[ix] + output_counts[ix]
+        sockets = [socketData(socket_ix) for socket_ix in range(first_socket, first_socket + sockets_count)]
+        first_socket += sockets_count
+
+        yield 'nodes', {
+            'id': node_id,
+            'title': strings[titles[ix]],
+            'pos_x': pos_xs[ix],
+            'pos_y': pos_ys[ix],
+            'inputs': sockets[:input_counts[ix]],
+            'outputs': sockets[input_counts[ix]:],
+            'content': contentData(contents[ix]),
+        }
+
+    for ix, edge_id in enumerate(edge_ids):
+        yield 'edges', {
+            'id': edge_id,
+            'edge_type': edge_types[ix],
+            'start': socket_ids[starts[ix]],
+            'end': socket_ids[ends[ix]],
+        }
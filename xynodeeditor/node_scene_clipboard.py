@@ -1,5 +1,4 @@
 from collections import OrderedDict
-from xynodeeditor.node_graphics_edge import QDMGraphicsEdge
 from xynodeeditor.node_node import Node
 from xynodeeditor.node_edge import Edge
 
@@ -17,12 +16,12 @@ class SceneClipboard():
         sel_nodes, sel_edges, sel_sockets = [], [], {}
 
         # sort edges and nodes
-        for item in self.scene.grScene.selectedItems():
+        for item in self.scene.getSelectedItems():
             if hasattr(item, 'node'):
                 sel_nodes.append(item.node.serialize())
                 for socket in (item.node.inputs + item.node.outputs):
                     sel_sockets[socket.id] = socket
-            elif isinstance(item, QDMGraphicsEdge):
+            elif hasattr(item, 'edge'):
                 sel_edges.append(item.edge)
 
         # debug
@@ -53,9 +52,10 @@ class SceneClipboard():
 
         # if CUT (aka delete)
         if delete:
-            self.scene.grScene.views()[0].deleteSelectd()
-            # store our history
-            self.scene.hitory.storeHistory("Cut out element from scene", setModified=True)
+            with self.scene.transaction("Cut out element from scene"):
+                self.scene.grScene.views()[0].deleteSelected()
+                # store our history
+                self.scene.history.storeHistory("Cut out element from scene", setModified=True)
 
         return data
 
@@ -85,21 +85,21 @@ class SceneClipboard():
         offset_x = mouse_scene_pos.x() - bbox_center_x
         offset_y = mouse_scene_pos.y() - bbox_center_y
 
-        # create each node
+        with self.scene.transaction("Pasted items in scene"), self.scene.deferUI():
+            # create each node
+            for node_data in data['nodes']:
+                new_node = Node(self.scene)
+                new_node.deserialize(node_data, hashmap, restore_id=False)
 
-        for node_data in data['nodes']:
-            new_node = Node(self.scene)
-            new_node.deserialize(node_data, hashmap, restore_id=False)
-
-            # readjust the new node's position
-            pos = new_node.pos
-            new_node.setPos(pos.x() + offset_x, pos.y() + offset_y)
+                # readjust the new node's position
+                pos_x, pos_y = new_node.getPos()
+                new_node.setPos(pos_x + offset_x, pos_y + offset_y)
 
-        # create each edge
-        if 'edges' in data:
-            for edge_data in data['edges']:
-                new_edge = Edge(self.scene)
-                new_edge.deserialize(edge_data, hashmap, restore_id=False)
+            # create each edge
+            if 'edges' in data:
+                for edge_data in data['edges']:
+                    new_edge = Edge(self.scene)
+                    new_edge.deserialize(edge_data, hashmap, restore_id=False)
 
-        # store history
-        self.scene.history.storeHistory("Pasted items in scene", setModified=True)
+            # store history
+            self.scene.history.storeHistory("Pasted items in scene", setModified=True)
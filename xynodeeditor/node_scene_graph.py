@@ -0,0 +1,177 @@
+DEBUG = False
+
+
+class SceneGraph():
+    ''' which nodes are connected to which, kept up to date as edges are connected and removed '''
+    def __init__(self, scene):
+        self.scene = scene
+        self.clear()
+
+    def clear(self):
+        # node -> {connected node: number of edges}, values flow from parents to children
+        self._parents = {}
+        self._children = {}
+        # edge -> (parent, child) of the edges which have both sockets
+        self._edges = {}
+
+        # every node has a lower rank than its children, None when they have to be recomputed
+        self._ranks = {}
+        self._next_rank = 0
+        # nodes sorted by rank, None when it has to be sorted again
+        self._order = []
+
+    def invalidateOrder(self):
+        ''' drops the ranks, they are computed at once when needed, e.g. after loading many edges '''
+        self._ranks = None
+        self._order = None
+
+    def getEdgeNodes(self, start_socket, end_socket):
+        ''' returns (parent, child) of an edge between the sockets, edges can be dragged from inputs too '''
+        if start_socket.is_input and not end_socket.is_input:
+            return end_socket.node, start_socket.node
+        return start_socket.node, end_socket.node
+
+    def addNode(self, node):
+        self._parents[node] = {}
+        self._children[node] = {}
+        # a node without edges can go anywhere, the end is the cheapest
+        if self._ranks is None:
+            self._order = None
+        else:
+            self._ranks[node] = self._next_rank
+            self._next_rank += 1
+            if self._order is not None:
+                self._order.append(node)
+
+    def removeNode(self, node):
+        # its edges were removed before
+        self._parents.pop(node, None)
+        self._children.pop(node, None)
+        if self._ranks is not None:
+            self._ranks.pop(node, None)
+        self._order = None
+
+    def addEdge(self, edge):
+        if edge.start_socket is None or edge.end_socket is None or edge in self._edges:
+            return
+        parent, child = self.getEdgeNodes(edge.start_socket, edge.end_socket)
+        self._edges[edge] = (parent, child)
+        children = self._children[parent]
+        children[child] = children.get(child, 0) + 1
+        parents = self._parents[child]
+        parents[parent] = parents.get(parent, 0) + 1
+
+        if self._ranks is None:
+            self._order = None
+        elif self._ranks[parent] >= self._ranks[child]:
+            self.reorder(parent, child)
+
+    def removeEdge(self, edge):
+        nodes = self._edges.pop(edge, None)
+        if nodes is None:
+            return
+        parent, child = nodes
+        for adjacency, node, other in ((self._children, parent, child), (self._parents, child, parent)):
+            connected = adjacency[node]
+            connected[other] -= 1
+            if not connected[other]:
+                del connected[other]
+
+        # ranks stay valid without an edge, but the edge may have been part of a cycle
+        if self._ranks is None:
+            self._order = None
+
+    def getParentNodes(self, node):
+        return list(self._parents[node])
+
+    def getChildrenNodes(self, node):
+        return list(self._children[node])
+
+    def walk(self, node, adjacency, accept=None):
+        ''' nodes reachable from node in adjacency without node itself, accept(node) limits the walk '''
+        visited = {node}
+        stack = [node]
+        found = []
+        while stack:
+            for other in adjacency[stack.pop()]:
+                if other not in visited and (accept is None or accept(other)):
+                    visited.add(other)
+                    stack.append(other)
+                    found.append(other)
+        return found
+
+    def getDescendants(self, node):
+        return self.walk(node, self._children)
+
+    def getAncestors(self, node):
+        return self.walk(node, self._parents)
+
+    def reorder(self, parent, child):
+        ''' restores the ranks after the edge parent -> child was added against them (Pearce-Kelly) '''
+        lower, upper = self._ranks[child], self._ranks[parent]
+        # only the nodes ranked between the two can be out of order
+        forward = [child] + self.walk(child, self._children, lambda node: self._ranks[node] <= upper)
+        if parent in forward or parent is child:
+            # the edge closed a cycle, there is no topological order until it is removed
+            if DEBUG:
+                print("SceneGraph::reorder ~ cycle through", parent)
+            self.invalidateOrder()
+            return
+        backward = [parent] + self.walk(parent, self._parents, lambda node: self._ranks[node] >= lower)
+
+        backward.sort(key=self._ranks.get)
+        forward.sort(key=self._ranks.get)
+        nodes = backward + forward
+        for node, rank in zip(nodes, sorted(self._ranks[node] for node in nodes)):
+            self._ranks[node] = rank
+        self._order = None
+
+    def updateRanks(self):
+        ''' computes the ranks of all nodes at once, returns False if the graph has a cycle '''
+        if self._ranks is not None:
+            return True
+        if self._order is not None:
+            # cyclic and not rewired since
+            return False
+
+        in_degrees = {node: len(parents) for node, parents in self._parents.items()}
+        order = [node for node, in_degree in in_degrees.items() if not in_degree]
+        for node in order:
+            for child in self._children[node]:
+                in_degrees[child] -= 1
+                if not in_degrees[child]:
+                    order.append(child)
+
+        if len(order) < len(in_degrees):
+            # nodes on or after a cycle go last
+            ordered = set(order)
+            self._order = order + [node for node in in_degrees if node not in ordered]
+            return False
+
+        self._ranks = {node: rank for rank, node in enumerate(order)}
+        self._next_rank = len(order)
+        self._order = order
+        return True
+
+    def getTopologicalOrder(self):
+        ''' all nodes, each one before its children; do not change the returned list '''
+        if self._order is None and self.updateRanks():
+            self._order = sorted(self._ranks, key=self._ranks.get)
+        return self._order
+
+    def hasCycle(self):
+        return not self.updateRanks()
+
+    def wouldCreateCycle(self, start_socket, end_socket):
+        ''' checks if an edge between the sockets would make a node depend on itself '''
+        parent, child = self.getEdgeNodes(start_socket, end_socket)
+        if parent is child:
+            return True
+
+        if not self.updateRanks():
+            return parent in self.getDescendants(child)
+        upper = self._ranks[parent]
+        if self._ranks[child] > upper:
+            return False
+        # only nodes ranked before the parent can lead to it
+        return parent in self.walk(child, self._children, lambda node: self._ranks[node] <= upper)
@@ -1,38 +1,363 @@
-from xynodeeditor.node_graphics_edge import QDMGraphicsEdge
+import sys
+import time
 
+from xynodeeditor.node_node import Node
+from xynodeeditor.node_edge import Edge
+
+
+HISTORY_MODE_SNAPSHOT = 1
+HISTORY_MODE_DELTA = 2
+
+# oldest stamps are dropped when the history takes more memory than this (bytes)
+HISTORY_MEMORY_LIMIT = 64 * 1024 * 1024
+# moves of the same nodes closer in time than this (seconds) are merged into one stamp
+MOVE_MERGE_INTERVAL = 2.0
+# with a journal, older stamps are kept on disk only
+JOURNAL_MEMORY_STAMPS = 32
 
 DEBUG = False
 
 
 class SceneHistory():
-    def __init__(self, scene):
+    def __init__(self, scene, mode=HISTORY_MODE_DELTA):
         self.scene = scene
+        self.mode = mode
+
+        self.history_stack = []
+        self.history_current_step = -1
+        # None means the number of stamps is limited by history_memory_limit only
+        self.history_limit = None
+        self.history_memory_limit = HISTORY_MEMORY_LIMIT
+        self.move_merge_interval = MOVE_MERGE_INTERVAL
 
+        # serialized records are shared between stamps, each one is counted once:
+        # id(record) -> [record, references, size]
+        self._records = {}
+        self._memory_usage = 0
+
+        # all stamps are written to the journal, the ones before _first_in_memory are None in history_stack
+        self.journal = None
+        self.journal_memory_stamps = JOURNAL_MEMORY_STAMPS
+        self._first_in_memory = 0
+
+        # snapshot mode: patch the live scene instead of rebuilding it on restore
+        self.restore_by_patch = True
+
+        # changes made to the scene since the last stored stamp
+        self._restoring = False
+        self.clearChanges()
+
+        # stamps requested inside a transaction are stored as one when it ends
+        self._transaction_depth = 0
+        self._transaction_desc = None
+        self._transaction_store = False
+        self._transaction_modified = False
+
+    def clear(self):
         self.history_stack = []
         self.history_current_step = -1
-        self.history_limit = 8
+        self._records = {}
+        self._memory_usage = 0
+        self._first_in_memory = 0
+        self.clearChanges()
+
+        # the stamps stored from now on start from the current scene
+        if self.journal is not None:
+            self.journal.start(self.scene.serialize())
+
+    def startJournal(self, journal):
+        ''' writes all stamps to journal, only the recent ones are kept in memory '''
+        self.journal = journal
+        self.clear()
+        self.storeHistory("Start journal")
+
+    def stopJournal(self, remove=True):
+        ''' stops writing stamps to the journal, the stamps which are on disk only are dropped when it is removed '''
+        if self.journal is None:
+            return
+        # the journal is removed on close, New and Open, which throw the history away anyway
+        if not remove:
+            self.pageInStamps()
+        self.dropPagedOutStamps()
+
+        if remove:
+            self.journal.remove()
+        else:
+            self.journal.close()
+        self.journal = None
+
+    def recoverJournal(self, journal):
+        ''' restores the scene and its history from the journal of a session which did not end '''
+        journal.open()
+        self.journal = None
+        self.scene.deserialize(journal.readBase())
+        self.clear()
+
+        count = journal.getStampsCount()
+        step = journal.cursor if journal.cursor is not None else count - 1
+        if self.mode == HISTORY_MODE_SNAPSHOT:
+            snapshot_step = step
+            while snapshot_step > 0 and 'snapshot' not in journal.readStamp(snapshot_step):
+                snapshot_step -= 1
+            self.restoreHistoryStamp(journal.readStamp(snapshot_step))
+        else:
+            for index in range(1, step + 1):
+                history_stamp = journal.readStamp(index)
+                if 'changes' in history_stamp:
+                    self.applyHistoryStamp(history_stamp)
+        self.restoreSelection(journal.readStamp(step)['selection'])
+
+        # the stamps around the current step are kept in memory again
+        self.journal = journal
+        self.history_stack = [None] * count
+        self.history_current_step = step
+        self._first_in_memory = max(0, step - self.journal_memory_stamps + 1)
+        for index in range(self._first_in_memory, count):
+            self.history_stack[index] = journal.readStamp(index)
+            self.acquireStamp(self.history_stack[index])
+
+    def pageInStamps(self):
+        ''' reads the newest stamps which are on disk only back to memory while they fit in the limits '''
+        step = self._first_in_memory - 1
+        while step >= 0 and (self.history_limit is None or len(self.history_stack) - step <= self.history_limit):
+            history_stamp = self.journal.readStamp(step)
+            self.acquireStamp(history_stamp)
+            if self._memory_usage > self.history_memory_limit:
+                self.releaseStamp(history_stamp)
+                break
+            self.history_stack[step] = history_stamp
+            self._first_in_memory = step
+            step -= 1
+
+    def dropPagedOutStamps(self):
+        ''' drops the stamps which are on disk only, the history starts at the oldest stamp in memory '''
+        first = self._first_in_memory
+        if not first:
+            return
+        # the first stamp is the base the following selection stamps are restored on
+        if self.mode == HISTORY_MODE_SNAPSHOT and self.isSelectionStamp(self.history_stack[first]):
+            step = first - 1
+            history_stamp = self.journal.readStamp(step)
+            while 'snapshot' not in history_stamp:
+                step -= 1
+                history_stamp = self.journal.readStamp(step)
+            self.acquireRecord(history_stamp['snapshot'])
+            self.history_stack[first]['snapshot'] = history_stamp['snapshot']
+
+        del self.history_stack[:first]
+        self.history_current_step -= first
+        self._first_in_memory = 0
+
+    def getStamp(self, step):
+        ''' returns the stamp at step, reading it from the journal when it is not in memory '''
+        history_stamp = self.history_stack[step]
+        if history_stamp is None:
+            history_stamp = self.journal.readStamp(step)
+        return history_stamp
+
+    def isPagedOut(self, step):
+        return self.history_stack[step] is None
+
+    def writeJournalStamp(self, history_stamp):
+        ''' writes the current stamp to the journal and pages out the stamps it made too old '''
+        if self.journal is None:
+            return
+        self.journal.writeStamp(self.history_current_step, history_stamp)
+        self.journal.writeCursor(self.history_current_step)
+        self.pageOutStamps()
+
+    def writeJournalCursor(self):
+        if self.journal is not None:
+            self.journal.writeCursor(self.history_current_step)
+
+    def pageOutStamps(self):
+        ''' keeps the journal_memory_stamps most recent stamps in memory, within the memory limit '''
+        while self._first_in_memory < self.history_current_step and (
+                self.history_current_step - self._first_in_memory >= self.journal_memory_stamps or
+                self._memory_usage > self.history_memory_limit):
+            self.releaseStamp(self.history_stack[self._first_in_memory])
+            self.history_stack[self._first_in_memory] = None
+            self._first_in_memory += 1
+
+    def getMemoryUsage(self):
+        ''' approximate size of all stamps in bytes, records shared by stamps are counted once '''
+        return self._memory_usage
+
+    def getRecordSize(self, value, children):
+        ''' size of value without the dicts inside it, those are appended to children '''
+        size = sys.getsizeof(value)
+        for item in (value.values() if isinstance(value, dict) else value):
+            if isinstance(item, dict):
+                children.append(item)
+            elif isinstance(item, list):
+                size += self.getRecordSize(item, children)
+            else:
+                size += sys.getsizeof(item)
+        return size
+
+    def acquireRecord(self, record):
+        ''' counts a reference to record, the records inside it are counted when it is new '''
+        entry = self._records.get(id(record))
+        if entry is not None:
+            entry[1] += 1
+            return
+
+        children = []
+        size = self.getRecordSize(record, children)
+        self._records[id(record)] = [record, 1, size]
+        self._memory_usage += size
+        for child in children:
+            self.acquireRecord(child)
+
+    def releaseRecord(self, record):
+        entry = self._records[id(record)]
+        entry[1] -= 1
+        if entry[1] > 0:
+            return
+
+        del self._records[id(record)]
+        self._memory_usage -= entry[2]
+        children = []
+        self.getRecordSize(record, children)
+        for child in children:
+            self.releaseRecord(child)
+
+    def getStampParts(self, history_stamp):
+        parts = [history_stamp['selection']]
+        if 'moved_nodes' in history_stamp:
+            parts.append(history_stamp['moved_nodes'])
+        if 'snapshot' in history_stamp:
+            parts.append(history_stamp['snapshot'])
+        if 'changes' in history_stamp:
+            parts.append(history_stamp['changes'])
+        return parts
+
+    def acquireStamp(self, history_stamp):
+        for part in self.getStampParts(history_stamp):
+            self.acquireRecord(part)
+
+    def releaseStamp(self, history_stamp):
+        for part in self.getStampParts(history_stamp):
+            self.releaseRecord(part)
+
+    def clearChanges(self):
+        self._nodes_added = {}
+        self._edges_added = {}
+        self._nodes_removed = {}
+        self._edges_removed = {}
+        self._nodes_moved = {}
+        # snapshot mode stores the whole scene, it only needs to know that something changed
+        self._snapshot_changed = False
+
+    def isRecording(self):
+        return self.mode == HISTORY_MODE_DELTA and not self._restoring
+
+    def recordChanged(self):
+        if self.mode == HISTORY_MODE_SNAPSHOT and not self._restoring:
+            self._snapshot_changed = True
+
+    def recordAdded(self, item):
+        if not self.isRecording():
+            self.recordChanged()
+            return
+        if isinstance(item, Node):
+            self._nodes_added[item] = None
+        else:
+            self._edges_added[item] = None
+
+    def recordRemoved(self, item):
+        if not self.isRecording():
+            self.recordChanged()
+            return
+        added, removed = (self._nodes_added, self._nodes_removed) if isinstance(item, Node) else \
+            (self._edges_added, self._edges_removed)
+
+        # created and removed again before any stamp, nothing to remember
+        if item in added:
+            del added[item]
+            self._nodes_moved.pop(item, None)
+            return
+        removed[item] = item.serialize()
+
+    def recordMoved(self, node):
+        if not self.isRecording():
+            self.recordChanged()
+            return
+        if node in self._nodes_added or node in self._nodes_moved:
+            return
+        self._nodes_moved[node] = node.getPos()
+
+    def hasChanges(self):
+        if self.mode == HISTORY_MODE_SNAPSHOT:
+            return self._snapshot_changed
+        return bool(self._nodes_added or self._edges_added or self._nodes_removed or
+                    self._edges_removed or self._nodes_moved)
 
     def undo(self):
         if DEBUG:
             print("UNDO")
         if self.history_current_step > 0:
+            history_stamp = self.getStamp(self.history_current_step)
             self.history_current_step -= 1
-            self.restoreHistory()
+            if 'changes' in history_stamp:
+                self.revertHistoryStamp(history_stamp)
+            elif 'snapshot' in history_stamp:
+                self.restoreHistory()
+            else:
+                self.restoreSelection(self.getStamp(self.history_current_step)['selection'])
+            self.writeJournalCursor()
 
     def redo(self):
         if DEBUG:
             print("REDO")
         if self.history_current_step + 1 < len(self.history_stack):
             self.history_current_step += 1
-            self.restoreHistory()
+            history_stamp = self.getStamp(self.history_current_step)
+            if 'changes' in history_stamp:
+                self.applyHistoryStamp(history_stamp)
+            elif 'snapshot' in history_stamp:
+                self.restoreHistory()
+            else:
+                self.restoreSelection(history_stamp['selection'])
+            self.writeJournalCursor()
 
     def restoreHistory(self):
         if DEBUG:
             print("Restoring history... current_step: @%d" % self.history_current_step,
                   "(%d)" % len(self.history_stack))
-        self.restoreHistoryStamp(self.history_stack[self.history_current_step])
+        step = self.history_current_step
+        # selection stamps have no snapshot, use the one they were taken on
+        history_stamp = self.getStamp(step)
+        while 'snapshot' not in history_stamp:
+            step -= 1
+            history_stamp = self.getStamp(step)
+        self.restoreHistoryStamp(history_stamp)
+        if step != self.history_current_step:
+            self.restoreSelection(self.getStamp(self.history_current_step)['selection'])
+
+    def beginTransaction(self, desc):
+        if self._transaction_depth == 0:
+            self._transaction_desc = desc
+            self._transaction_store = False
+            self._transaction_modified = False
+        self._transaction_depth += 1
+
+    def endTransaction(self):
+        self._transaction_depth -= 1
+        if self._transaction_depth > 0:
+            return
+
+        # edits made by scripts without storing history are stamped too
+        changed = self.hasChanges()
+        if self._transaction_store or changed:
+            self.storeHistory(self._transaction_desc, setModified=self._transaction_modified or changed)
 
     def storeHistory(self, desc,setModified=False):
+        if self._transaction_depth:
+            self._transaction_store = True
+            self._transaction_modified = self._transaction_modified or setModified
+            return
+
         if setModified:
             self.scene.has_been_modified = True
         if DEBUG:
@@ -40,56 +365,269 @@ class SceneHistory():
                   "... current_step: @%d" % self.history_current_step,
                   "(%d)" % len(self.history_stack))
 
+        self.pushHistoryStamp(self.createHistoryStamp(desc))
+
+    def storeMoveHistory(self, desc, nodes):
+        ''' stores moving nodes, repeated moves of the same nodes are merged into the last stamp '''
+        if self._transaction_depth:
+            self.storeHistory(desc, setModified=True)
+            return
+
+        node_ids = sorted(node.id for node in nodes)
+        now = time.monotonic()
+        if self.canMergeMove(node_ids, now):
+            self.mergeMoveStamp(now)
+        else:
+            history_stamp = self.createHistoryStamp(desc)
+            history_stamp['moved_nodes'] = node_ids
+            history_stamp['time'] = now
+            self.pushHistoryStamp(history_stamp)
+        self.scene.has_been_modified = True
+
+    def canMergeMove(self, node_ids, now):
+        # the first stamp is the base of undo, and stamps after the current one would be lost
+        if self.history_current_step < 1 or self.history_current_step + 1 < len(self.history_stack):
+            return False
+        if self.isPagedOut(self.history_current_step):
+            return False
+        current_stamp = self.history_stack[self.history_current_step]
+        if current_stamp.get('moved_nodes') != node_ids or now - current_stamp['time'] > self.move_merge_interval:
+            return False
+        # something else changed since, it needs its own stamp
+        return not (self._nodes_added or self._edges_added or self._nodes_removed or self._edges_removed)
+
+    def mergeMoveStamp(self, now):
+        current_stamp = self.history_stack[self.history_current_step]
+        history_stamp = dict(current_stamp)
+        history_stamp['selection'] = self.createSelectionStamp()
+        history_stamp['time'] = now
+
+        if 'changes' in current_stamp:
+            # positions before the first merged move, nodes are where they are now
+            old_positions = {node_id: (old_x, old_y)
+                             for node_id, old_x, old_y, new_x, new_y in current_stamp['changes']['nodes_moved']}
+            for node, old_pos in self._nodes_moved.items():
+                old_positions.setdefault(node.id, old_pos)
+            self.clearChanges()
+
+            moved = []
+            for node_id, (old_x, old_y) in old_positions.items():
+                node = self.scene.getNodeById(node_id)
+                if node is not None and node.getPos() != (old_x, old_y):
+                    moved.append([node_id, old_x, old_y] + list(node.getPos()))
+            history_stamp['changes'] = dict(current_stamp['changes'], nodes_moved=moved)
+        else:
+            history_stamp['snapshot'] = self.scene.serialize()
+            self.clearChanges()
+
+        self.acquireStamp(history_stamp)
+        self.releaseStamp(current_stamp)
+        self.history_stack[self.history_current_step] = history_stamp
+        self.writeJournalStamp(history_stamp)
+
+    def storeSelectionHistory(self, desc):
+        ''' stores only the selected ids, consecutive selection stamps replace each other '''
+        if self._transaction_depth:
+            return
+        # pending changes or an empty stack need a real stamp
+        if not self.history_stack or self.hasChanges():
+            self.storeHistory(desc)
+            return
+
+        sel_obj = self.createSelectionStamp()
+        current_stamp = self.getStamp(self.history_current_step)
+        if sel_obj == current_stamp['selection']:
+            return
+
+        if DEBUG:
+            print("Storing selection", '"%s"' % desc,
+                  "... current_step: @%d" % self.history_current_step,
+                  "(%d)" % len(self.history_stack))
+
+        history_stamp = {
+            'desc': desc,
+            'selection': sel_obj,
+        }
+        # a stamp which is on disk only is followed by stamps in memory, it is not replaced
+        if self.isSelectionStamp(current_stamp) and not self.isPagedOut(self.history_current_step):
+            self.acquireStamp(history_stamp)
+            self.releaseStamp(current_stamp)
+            self.history_stack[self.history_current_step] = history_stamp
+            self.truncateStack()
+            self.writeJournalStamp(history_stamp)
+            return
+        self.pushHistoryStamp(history_stamp)
+
+    def truncateStack(self):
+        ''' drops the stamps after the current step, they cannot be redone anymore '''
+        for history_stamp in self.history_stack[self.history_current_step + 1:]:
+            if history_stamp is not None:
+                self.releaseStamp(history_stamp)
+        del self.history_stack[self.history_current_step + 1:]
+        self._first_in_memory = min(self._first_in_memory, len(self.history_stack))
+
+    def pushHistoryStamp(self, history_stamp):
         # if pointer history_current step is not at the end of history stack
         if self.history_current_step + 1 < len(self.history_stack):
-            self.history_stack = self.history_stack[0:self.history_current_step+1]
+            self.truncateStack()
 
-        # history is outside of the limits
-        if self.history_current_step + 1 >= self.history_limit:
-            self.history_stack = self.history_stack[1:]
+        # history is outside of the limits, with a journal old stamps are paged out instead
+        if self.journal is None and self.history_limit is not None and \
+                self.history_current_step + 1 >= self.history_limit:
+            self.dropOldestStamp()
             self.history_current_step -= 1
 
-        hs = self.createHistoryStamp(desc)
-
-        self.history_stack.append(hs)
+        self.history_stack.append(history_stamp)
         self.history_current_step += 1
+        self.acquireStamp(history_stamp)
+
+        self.writeJournalStamp(history_stamp)
+
+        # keep at least the current stamp, it is the base of the next undo
+        while self.journal is None and self._memory_usage > self.history_memory_limit and \
+                self.history_current_step > 0:
+            self.dropOldestStamp()
+            self.history_current_step -= 1
         if DEBUG:
-            print("  -- setting step to:", self.history_current_step)
+            print("  -- setting step to:", self.history_current_step,
+                  "memory usage:", self._memory_usage)
 
-    def createHistoryStamp(self, desc):
+    def dropOldestStamp(self):
+        dropped_stamp = self.history_stack.pop(0)
+        # the first stamp is the base the following selection stamps are restored on
+        if 'snapshot' in dropped_stamp and self.history_stack and self.isSelectionStamp(self.history_stack[0]):
+            self.acquireRecord(dropped_stamp['snapshot'])
+            self.history_stack[0]['snapshot'] = dropped_stamp['snapshot']
+        self.releaseStamp(dropped_stamp)
+
+    def isSelectionStamp(self, history_stamp):
+        return 'changes' not in history_stamp and 'snapshot' not in history_stamp
+
+    def createSelectionStamp(self):
         sel_obj = {
             'nodes': [],
             'edges': [],
         }
 
-        for item in self.scene.grScene.selectedItems():
+        for item in self.scene.getSelectedItems():
             if hasattr(item, 'node'):
                 sel_obj['nodes'].append(item.node.id)
-            elif isinstance(item, QDMGraphicsEdge):
+            elif hasattr(item, 'edge'):
                 sel_obj["edges"].append(item.edge.id)
+        return sel_obj
 
+    def createHistoryStamp(self, desc):
         history_stamp = {
             'desc': desc,
-            'snapshot': self.scene.serialize(),
-            'selection': sel_obj,
+            'selection': self.createSelectionStamp(),
         }
+        if self.mode == HISTORY_MODE_DELTA:
+            history_stamp['changes'] = self.createChangesStamp()
+        else:
+            history_stamp['snapshot'] = self.scene.serialize()
+            self.clearChanges()
         return history_stamp
 
+    def createChangesStamp(self):
+        moved = []
+        for node, old_pos in self._nodes_moved.items():
+            pos = node.getPos()
+            if pos != old_pos:
+                moved.append([node.id, old_pos[0], old_pos[1], pos[0], pos[1]])
+
+        changes = {
+            'nodes_added': [node.serialize() for node in self._nodes_added],
+            'edges_added': [edge.serialize() for edge in self._edges_added],
+            'nodes_removed': list(self._nodes_removed.values()),
+            'edges_removed': list(self._edges_removed.values()),
+            'nodes_moved': moved,
+        }
+        self.clearChanges()
+        return changes
+
     def restoreHistoryStamp(self, history_stamp):
         if DEBUG:
             print("RHS: ", history_stamp['desc'])
 
-        self.scene.deserialize(history_stamp['snapshot'])
+        self._restoring = True
+        try:
+            if self.restore_by_patch:
+                self.scene.patch(history_stamp['snapshot'])
+            else:
+                self.scene.deserialize(history_stamp['snapshot'])
+        finally:
+            self._restoring = False
+
+        self.restoreSelection(history_stamp['selection'])
+
+    def applyHistoryStamp(self, history_stamp):
+        ''' redo the changes of a delta stamp '''
+        if DEBUG:
+            print("AHS: ", history_stamp['desc'])
+        changes = history_stamp['changes']
+        self._restoring = True
+        try:
+            self.removeItems(changes['nodes_removed'], changes['edges_removed'])
+            self.createItems(changes['nodes_added'], changes['edges_added'])
+            for node_id, old_x, old_y, new_x, new_y in changes['nodes_moved']:
+                self.moveNode(node_id, new_x, new_y)
+        finally:
+            self._restoring = False
+
+        self.restoreSelection(history_stamp['selection'])
+
+    def revertHistoryStamp(self, history_stamp):
+        ''' undo the changes of a delta stamp, selection goes back to the current step '''
+        if DEBUG:
+            print("RVHS: ", history_stamp['desc'])
+        changes = history_stamp['changes']
+        self._restoring = True
+        try:
+            self.removeItems(changes['nodes_added'], changes['edges_added'])
+            self.createItems(changes['nodes_removed'], changes['edges_removed'])
+            for node_id, old_x, old_y, new_x, new_y in changes['nodes_moved']:
+                self.moveNode(node_id, old_x, old_y)
+        finally:
+            self._restoring = False
+
+        self.restoreSelection(self.getStamp(self.history_current_step)['selection'])
+
+    def removeItems(self, nodes_data, edges_data):
+        nodes = [self.scene.getNodeById(node_data['id']) for node_data in nodes_data]
+        edges = [self.scene.getEdgeById(edge_data['id']) for edge_data in edges_data]
+        self.scene.removeItems([node for node in nodes if node is not None],
+                               [edge for edge in edges if edge is not None])
+
+    def createItems(self, nodes_data, edges_data):
+        hashmap = {}
+        for node_data in nodes_data:
+            Node(self.scene).deserialize(node_data, hashmap, restore_id=True)
+
+        for edge_data in edges_data:
+            # sockets of nodes which stayed in the scene
+            for socket_id in (edge_data['start'], edge_data['end']):
+                if socket_id not in hashmap:
+                    hashmap[socket_id] = self.scene.getSocketById(socket_id)
+            Edge(self.scene).deserialize(edge_data, hashmap, restore_id=True)
+
+    def moveNode(self, node_id, x, y):
+        node = self.scene.getNodeById(node_id)
+        if node is not None:
+            node.setPos(x, y)
+            node.updateConnectedEdges()
+
+    def restoreSelection(self, selection):
+        if self.scene.isHeadless():
+            return
+        self.scene.grScene.clearSelection()
 
         # restor selection
-        for edge_id in history_stamp["selection"]['edges']:
-            for edge in self.scene.edges:
-                if edge.id == edge_id:
-                    edge.grEdge.setSelected(True)
-                    break
-
-        for node_id in history_stamp["selection"]['nodes']:
-            for node in self.scene.nodes:
-                if node.id == node_id:
-                    node.grNode.setSelected(True)
-                    break
+        for edge_id in selection['edges']:
+            edge = self.scene.getEdgeById(edge_id)
+            if edge is not None:
+                edge.grEdge.setSelected(True)
+
+        for node_id in selection['nodes']:
+            node = self.scene.getNodeById(node_id)
+            if node is not None:
+                node.grNode.setSelected(True)
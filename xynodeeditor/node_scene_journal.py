@@ -0,0 +1,131 @@
+import json
+import os
+import struct
+import zlib
+
+
+JOURNAL_MAGIC = b'XYNJ'
+JOURNAL_VERSION = 1
+
+HEADER = struct.Struct('<4sH')
+# every record is its compressed length followed by zlib compressed json
+RECORD_LENGTH = struct.Struct('<I')
+
+RECORD_BASE = 'base'
+RECORD_STAMP = 'stamp'
+RECORD_CURSOR = 'cursor'
+
+
+def encodeRecord(record):
+    data = zlib.compress(json.dumps(record, separators=(',', ':')).encode('utf-8'))
+    return RECORD_LENGTH.pack(len(data)) + data
+
+
+class SceneJournal():
+    ''' history stamps appended to a file, older stamps are read back when undo reaches them '''
+    def __init__(self, filename):
+        self.filename = filename
+        self.file = None
+
+        # file offset of every stamp record, the base record and the end of the valid records
+        self.offsets = []
+        self.base_offset = None
+        self.end_offset = HEADER.size
+        self.cursor = None
+
+    def exists(self):
+        return os.path.exists(self.filename)
+
+    def start(self, snapshot):
+        ''' starts a new journal on the scene state in snapshot '''
+        self.close()
+        self.file = open(self.filename, 'w+b')
+        self.file.write(HEADER.pack(JOURNAL_MAGIC, JOURNAL_VERSION))
+        self.offsets = []
+        self.end_offset = HEADER.size
+        self.cursor = None
+
+        self.base_offset = self.writeRecord({'type': RECORD_BASE, 'snapshot': snapshot})
+
+    def open(self):
+        ''' opens an existing journal, records after a crash in the middle of a write are dropped '''
+        self.close()
+        self.file = open(self.filename, 'r+b')
+        magic, version = HEADER.unpack(self.file.read(HEADER.size))
+        if magic != JOURNAL_MAGIC or version > JOURNAL_VERSION:
+            raise ValueError("Unsupported journal file %s" % self.filename)
+
+        self.offsets = []
+        self.base_offset = None
+        self.cursor = None
+        offset = HEADER.size
+        while True:
+            record = self.readRecordAt(offset)
+            if record is None:
+                break
+            if record['type'] == RECORD_BASE:
+                self.base_offset = offset
+            elif record['type'] == RECORD_STAMP:
+                del self.offsets[record['index']:]
+                self.offsets.append(offset)
+            elif record['type'] == RECORD_CURSOR:
+                self.cursor = record['step']
+            offset = self.file.tell()
+
+        if self.base_offset is None:
+            raise ValueError("Journal file %s has no base snapshot" % self.filename)
+        self.end_offset = offset
+        self.file.truncate(offset)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def remove(self):
+        self.close()
+        if self.exists():
+            os.remove(self.filename)
+
+    def readRecordAt(self, offset):
+        self.file.seek(offset)
+        length = self.file.read(RECORD_LENGTH.size)
+        if len(length) < RECORD_LENGTH.size:
+            return None
+        data = self.file.read(RECORD_LENGTH.unpack(length)[0])
+        try:
+            return json.loads(zlib.decompress(data).decode('utf-8'))
+        except (zlib.error, ValueError):
+            return None
+
+    def writeRecord(self, record):
+        offset = self.end_offset
+        self.file.seek(offset)
+        self.file.write(encodeRecord(record))
+        self.file.flush()
+        self.end_offset = self.file.tell()
+        return offset
+
+    def readBase(self):
+        return self.readRecordAt(self.base_offset)['snapshot']
+
+    def writeStamp(self, index, history_stamp):
+        ''' writes the stamp at index, the stamps after it are dropped from the journal '''
+        if index < len(self.offsets):
+            self.end_offset = self.offsets[index]
+            self.file.truncate(self.end_offset)
+            del self.offsets[index:]
+            # cursor records after the stamp are gone as well
+            self.cursor = None
+        self.offsets.append(self.writeRecord({'type': RECORD_STAMP, 'index': index, 'stamp': history_stamp}))
+
+    def readStamp(self, index):
+        return self.readRecordAt(self.offsets[index])['stamp']
+
+    def writeCursor(self, step):
+        if step != self.cursor:
+            self.cursor = step
+            self.writeRecord({'type': RECORD_CURSOR, 'step': step})
+
+    def getStampsCount(self):
+        return len(self.offsets)
@@ -0,0 +1,84 @@
+import threading
+from collections import deque
+
+from PySide2.QtCore import QCoreApplication, QEvent, QObject, Signal
+from xynodeeditor.node_scene_stream import FILE_FORMAT_JSON, writeSceneFile
+
+
+class SceneSaver(QObject):
+    ''' writes scene files on a worker thread, the scene is serialized on the GUI thread first '''
+    saveFinished = Signal(str)
+    saveFailed = Signal(str, str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        # saves are written one after another, the last requested one wins on disk
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._worker = None
+        # filename -> scenes waiting for that file, set modified again when the save fails
+        self._pending_scenes = {}
+        # (filename, error) of the saves which failed since the last wait()
+        self._failures = []
+
+        self.saveFinished.connect(self.onSaveFinished)
+        self.saveFailed.connect(self.onSaveFailed)
+
+    def save(self, scene, filename, file_format=FILE_FORMAT_JSON):
+        # the snapshot is a copy, the scene can be edited while it is written
+        data = scene.serialize()
+        scene.has_been_modified = False
+        self._pending_scenes.setdefault(filename, []).append(scene)
+
+        with self._lock:
+            self._queue.append((data, filename, file_format))
+            if self._worker is None:
+                self._worker = threading.Thread(target=self.run, name="SceneSaver")
+                self._worker.start()
+
+    def isSaving(self):
+        with self._lock:
+            return self._worker is not None
+
+    def wait(self, timeout=None):
+        ''' waits for the queued saves, returns (filename, error) of those which failed since the last wait() '''
+        worker = self._worker
+        if worker is not None:
+            worker.join(timeout)
+        # deliver the queued saveFinished and saveFailed now, scenes of failed saves are modified again
+        QCoreApplication.sendPostedEvents(None, QEvent.MetaCall)
+
+        with self._lock:
+            failures, self._failures = self._failures, []
+        return failures
+
+    def run(self):
+        while True:
+            with self._lock:
+                if not self._queue:
+                    self._worker = None
+                    return
+                data, filename, file_format = self._queue.popleft()
+
+            try:
+                writeSceneFile(data, filename, file_format)
+            except Exception as e:
+                with self._lock:
+                    self._failures.append((filename, str(e)))
+                self.saveFailed.emit(filename, str(e))
+            else:
+                self.saveFinished.emit(filename)
+
+    def popPendingScene(self, filename):
+        scenes = self._pending_scenes[filename]
+        scene = scenes.pop(0)
+        if not scenes:
+            del self._pending_scenes[filename]
+        return scene
+
+    def onSaveFinished(self, filename):
+        self.popPendingScene(filename)
+
+    def onSaveFailed(self, filename, error):
+        print("!W:", "saving to", filename, "failed:", error)
+        self.popPendingScene(filename).has_been_modified = True
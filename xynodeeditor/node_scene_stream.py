@@ -0,0 +1,162 @@
+import json
+import os
+import stat
+import tempfile
+from xynodeeditor.node_scene_binary import dumpSceneBinary
+
+
+FILE_FORMAT_JSON = 1
+FILE_FORMAT_BINARY = 2
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# the umask can be read only by setting it, do it once before files are saved in the background
+_umask = os.umask(0)
+os.umask(_umask)
+NEW_FILE_MODE = 0o666 & ~_umask
+INDENT = '    '
+
+
+def writeSceneFile(data, filename, file_format=FILE_FORMAT_JSON):
+    ''' writes data to a temporary file next to filename and renames it, a crash never leaves half a file '''
+    directory, basename = os.path.split(os.path.abspath(filename))
+    handle, tmp_filename = tempfile.mkstemp(prefix='.' + basename + '.', suffix='.tmp', dir=directory)
+    try:
+        # mkstemp creates the file readable by the owner only, keep the mode a normal write would give
+        os.chmod(tmp_filename, getFileMode(filename))
+        if file_format == FILE_FORMAT_BINARY:
+            with os.fdopen(handle, "wb") as file:
+                dumpSceneBinary(data, file)
+                file.flush()
+                os.fsync(file.fileno())
+        else:
+            with os.fdopen(handle, "w", encoding='utf-8') as file:
+                dumpScene(data, file)
+                file.flush()
+                os.fsync(file.fileno())
+        os.replace(tmp_filename, filename)
+    except BaseException:
+        if os.path.exists(tmp_filename):
+            os.remove(tmp_filename)
+        raise
+
+
+def getFileMode(filename):
+    ''' mode of an existing file, or the default mode for new files under the current umask '''
+    try:
+        return stat.S_IMODE(os.stat(filename).st_mode)
+    except FileNotFoundError:
+        return NEW_FILE_MODE
+
+
+def iterSceneData(data, stream_keys=('nodes', 'edges')):
+    ''' yields (key, value) of data like SceneStreamReader does for a file '''
+    for key, value in data.items():
+        if key in stream_keys:
+            for item in value:
+                yield key, item
+        else:
+            yield key, value
+
+
+def dumpScene(data, file):
+    ''' writes data like json.dump(data, file, indent=4), list and generator values are written item by item '''
+    file.write('{')
+    first_key = True
+    for key, value in data.items():
+        file.write(('\n' if first_key else ',\n') + INDENT + json.dumps(key) + ': ')
+        first_key = False
+
+        if isinstance(value, dict) or isinstance(value, (str, int, float, bool)) or value is None:
+            file.write(json.dumps(value, indent=4).replace('\n', '\n' + INDENT))
+            continue
+
+        file.write('[')
+        empty = True
+        for item in value:
+            item_str = json.dumps(item, indent=4).replace('\n', '\n' + 2 * INDENT)
+            file.write(('\n' if empty else ',\n') + 2 * INDENT + item_str)
+            empty = False
+        file.write(']' if empty else '\n' + INDENT + ']')
+    file.write('}' if first_key else '\n}')
+
+
+class SceneStreamReader():
+    ''' iterates over (key, value) of a scene file, the items of stream_keys lists are read one by one '''
+    def __init__(self, file, stream_keys=('nodes', 'edges'), chunk_size=STREAM_CHUNK_SIZE):
+        self.file = file
+        self.stream_keys = stream_keys
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def readMore(self):
+        if self.eof:
+            return False
+        chunk = self.file.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        ''' skips whitespace and returns the next character, '' at the end of the file '''
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in ' \t\r\n':
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.readMore():
+                return ''
+
+    def expect(self, chars):
+        char = self.peek()
+        if char == '' or char not in chars:
+            raise ValueError("Expected %s at offset %d, got %r" % (" or ".join(chars), self.pos, char))
+        self.pos += 1
+        return char
+
+    def readValue(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # a number at the end of the buffer might continue in the next chunk
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            if not self.readMore():
+                value, self.pos = self.decoder.raw_decode(self.buffer, self.pos)
+                return value
+
+    def __iter__(self):
+        self.expect('{')
+        if self.peek() == '}':
+            return
+
+        while True:
+            key = self.readValue()
+            self.expect(':')
+
+            if key in self.stream_keys and self.peek() == '[':
+                self.pos += 1
+                if self.peek() == ']':
+                    self.pos += 1
+                else:
+                    while True:
+                        yield key, self.readValue()
+                        if self.expect(',]') == ']':
+                            break
+            else:
+                yield key, self.readValue()
+
+            if self.expect(',}') == '}':
+                return
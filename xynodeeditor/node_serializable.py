@@ -1,6 +1,22 @@
 class Serializable():
+    ''' records cached in _serialized are shared with history stamps, they are replaced, never changed '''
+    # ids are never reused, also not the ids of loaded objects after they are freed
+    _next_id = 1
+
     def __init__(self):
-        self.id = id(self)
+        self.id = Serializable.newId()
+
+    @staticmethod
+    def newId():
+        new_id = Serializable._next_id
+        Serializable._next_id += 1
+        return new_id
+
+    @staticmethod
+    def reserveId(used_id):
+        ''' keeps new ids above an id restored from data '''
+        if used_id >= Serializable._next_id:
+            Serializable._next_id = used_id + 1
 
     def serialize(self):
         raise NotImplementedError()
@@ -1,6 +1,5 @@
 from collections import OrderedDict
 from xynodeeditor.node_serializable import Serializable
-from xynodeeditor.node_graphics_socket import QDMGraphicsSocket
 
 
 LEFT_TOP = 1
@@ -11,20 +10,43 @@ RIGHT_BOTTOM = 4
 DEBUG = False
 
 class Socket(Serializable):
-    def __init__(self, node, index=0, position=LEFT_TOP, socket_type=1, multi_edges=True):
+    def __init__(self, node, index=0, position=LEFT_TOP, socket_type=1, multi_edges=True, is_input=False):
         super().__init__()
         self.node = node
         self.index = index
         self.position = position
         self.socket_type = socket_type
-        self.is_multi_edges = multi_edges
+        # values flow from output sockets into input sockets
+        self.is_input = is_input
 
-        self.grSocket = QDMGraphicsSocket(self, self.socket_type)  # must give a parent
+        self._serialized = None
+        self._is_multi_edges = multi_edges
 
-        self.grSocket.setPos(*self.node.getSocketPosition(index, position))
+        self.grSocket = None
+        if self.node.grNode is not None:
+            self.initUI()
 
         # self.edge = None
-        self.edges = []
+        # connected edges in insertion order, a dict makes removing one of them O(1)
+        self._edges = {}
+
+        self.node.scene.addSocket(self)
+
+    def initUI(self):
+        from xynodeeditor.node_graphics_socket import QDMGraphicsSocket
+
+        self.grSocket = QDMGraphicsSocket(self, self.socket_type)  # must give a parent
+        self.grSocket.setPos(*self.getSocketPosition())
+
+    @property
+    def is_multi_edges(self):
+        return self._is_multi_edges
+
+    @is_multi_edges.setter
+    def is_multi_edges(self, value):
+        if value != self._is_multi_edges:
+            self._is_multi_edges = value
+            self.invalidateSerialized()
 
     def __str__(self):
         return "<Socket %s..%s>" % (hex(id(self))[2:5], hex(id(self))[-3:])
@@ -32,13 +54,24 @@ class Socket(Serializable):
     def getSocketPosition(self):
         return self.node.getSocketPosition(self.index, self.position)
 
+    @property
+    def edges(self):
+        return list(self._edges)
+
+    def hasEdges(self):
+        return bool(self._edges)
+
     def addEdge(self, edge):
         # self.edge = edge
-        self.edges.append(edge)
+        self._edges[edge] = None
+        if self.is_input:
+            self.node.onInputChanged(self)
 
     def removeEdge(self, edge):
-        if edge in self.edges:
-            self.edges.remove(edge)
+        if edge in self._edges:
+            del self._edges[edge]
+            if self.is_input:
+                self.node.onInputChanged(self)
             if DEBUG:
                 print("!W:", "Socket::removeEdge", edge, "is removed!")
         else:
@@ -46,8 +79,10 @@ class Socket(Serializable):
                 print("!W:", "Socket::removeEdge", edge, "is not in the list")
 
     def removeAllEdges(self):
-        while self.edges:
-            edge = self.edges.pop(0)
+        edges, self._edges = self._edges, {}
+        if edges and self.is_input:
+            self.node.onInputChanged(self)
+        for edge in edges:
             edge.remove()
 
     # def hasEdge(self):
@@ -60,18 +95,27 @@ class Socket(Serializable):
             # probably older version of file, make Right socket multiedged by default
             return data['position'] in [RIGHT_BOTTOM, RIGHT_TOP]
 
+    def invalidateSerialized(self):
+        # the records of the node and of the edges contain the socket or its id
+        self._serialized = None
+        self.node.invalidateSerialized()
+        for edge in self._edges:
+            edge.invalidateSerialized()
+
     def serialize(self):
-        return OrderedDict([
-            ('id', self.id),
-            ('index', self.index),
-            ('multi_edges', self.is_multi_edges),
-            ('position', self.position),
-            ('socket_type', self.socket_type),
-        ])
+        if self._serialized is None:
+            self._serialized = OrderedDict([
+                ('id', self.id),
+                ('index', self.index),
+                ('multi_edges', self.is_multi_edges),
+                ('position', self.position),
+                ('socket_type', self.socket_type),
+            ])
+        return self._serialized
 
     def deserialize(self, data, hashmap={}, restore_id=True):
         if restore_id:
-            self.id = data["id"]
+            self.node.scene.reindexSocket(self, data["id"])
         self.is_multi_edges = self.determineMultiEdges(data)
         hashmap[data['id']] = self
 